@@ -0,0 +1,126 @@
+import numpy as np
+
+from connect_4 import default_game_board_size, default_connect, max_moves, line_table, win_shifts
+
+
+class Batch_Connect_4(object):
+    '''
+    Plays many games of Connect 4 in lockstep. Every active game advances one
+    ply per step, with the same rules as connect_4._Connect_4_Gamestate.
+    '''
+    default_game_board_size = default_game_board_size
+
+    def __init__(self, policy, pairings, game_board_size=default_game_board_size, connect=default_connect):
+        '''
+            Constructor for Batch_Connect_4
+            policy: Called as policy(players, boards) with the index of the
+                player to move and its (num_rows, num_cols) board for each
+                active game, returns the column each one plays
+            pairings: (N, 2) player indexes, the first one moves first
+            game_board_size: (num_rows, num_cols) of every board
+            connect: Stones in a line needed to win
+        '''
+        self.num_rows, self.num_cols = game_board_size
+        self.max_moves = max_moves(game_board_size)
+
+        self.policy = policy
+        self.pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+        num_games = len(self.pairings)
+
+        # Initialize boards to -1
+        self.game_board = np.zeros((num_games, self.num_rows, self.num_cols)) - 1
+        self.heights = np.zeros((num_games, self.num_cols), dtype=np.int64)
+        self.turn = np.zeros(num_games, dtype=np.int64)
+        self.num_moves = np.zeros(num_games, dtype=np.int64)
+        self.active = np.ones(num_games, dtype=bool)
+        # The winner -1 until one player wins, 0 for first player, 1 for second player
+        self.winner = np.full(num_games, -1, dtype=np.int64)
+        # Column of every valid move in order, -1 after the last one
+        self.moves = np.full((num_games, self.max_moves), -1, dtype=np.int8 if self.num_cols <= 127 else np.int16)
+
+        # Bitboard of each player's stones, laid out like connect_4._Bitboard_Gamestate,
+        # when the board fits in 64 bits. Larger boards only look at the lines
+        # through each new stone, which costs the same on any size of board
+        self.boards = None
+        if (self.num_rows + 1) * self.num_cols <= 64:
+            self.boards = np.zeros((num_games, 2), dtype=np.uint64)
+            self.shifts = [[np.uint64(shift) for shift in shifts] for shifts in win_shifts(self.num_rows, connect)]
+        else:
+            self.lines = line_table(tuple(game_board_size), connect)
+
+    def run_game(self):
+        '''
+        Play every game to the end, returns the winner of each
+        '''
+        while self.active.any():
+            self.step()
+        return self.winner
+
+    def step(self):
+        '''
+        Play one ply of every active game
+        '''
+        games = np.flatnonzero(self.active)
+
+        # Ensure there is never a stalemate
+        stalemate = self.num_moves[games] == self.max_moves
+        self.active[games[stalemate]] = False
+        games = games[~stalemate]
+        if len(games) == 0:
+            return
+
+        turn = self.turn[games]
+        players = self.pairings[games, turn]
+        moves = np.asarray(self.policy(players, self.game_board[games]), dtype=np.int64)
+
+        # Invalid plays end the game without a winner
+        valid = (moves >= 0) & (moves < self.num_cols)
+        height = self.heights[games, np.where(valid, moves, 0)]
+        valid &= height < self.num_rows
+        self.active[games[~valid]] = False
+        games, turn, moves, height = games[valid], turn[valid], moves[valid], height[valid]
+
+        # Play the pieces
+        self.game_board[games, self.num_rows - 1 - height, moves] = turn
+        self.heights[games, moves] += 1
+        self.moves[games, self.num_moves[games]] = moves
+        self.num_moves[games] += 1
+        self.turn[games] ^= 1
+
+        if self.boards is not None:
+            bits = (moves * (self.num_rows + 1) + height).astype(np.uint64)
+            self.boards[games, turn] |= np.left_shift(np.uint64(1), bits)
+            won = self._check_win(self.boards[games, turn])
+        else:
+            won = self._check_lines(games, (self.num_rows - 1 - height) * self.num_cols + moves, turn)
+        self.winner[games[won]] = turn[won]
+        self.active[games[won]] = False
+
+    def _check_win(self, boards):
+        won = np.zeros(len(boards), dtype=bool)
+        for shifts in self.shifts:
+            run = boards
+            for shift in shifts:
+                run = run & (run >> shift)
+            won |= run != 0
+        return won
+
+    def _check_lines(self, games, cells, turn):
+        '''
+        Whether the player who just played cells[i] in games[i] has a line through it
+        '''
+        boards = self.game_board.reshape(len(self.game_board), -1)
+        stones = boards[games[:, None, None], self.lines[cells]]
+        return (stones == turn[:, None, None]).all(axis=2).any(axis=1)
+
+
+def score_games(pairings, winners, num_players):
+    '''
+    Points of each player: +1 for a win, -1 for a loss and nothing for a draw
+    '''
+    pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+    points = np.select([winners == 0, winners == 1], [1, -1], 0)
+    scores = np.zeros(num_players, dtype=np.int64)
+    np.add.at(scores, pairings[:, 0], points)
+    np.add.at(scores, pairings[:, 1], -points)
+    return scores
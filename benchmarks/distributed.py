@@ -0,0 +1,43 @@
+'''
+Round robin on several TCP workers against 127.0.0.1, with one worker killed
+partway through to check its batches are reassigned
+
+Run from the repository root with `python -m benchmarks.distributed`
+'''
+import multiprocessing
+import threading
+import time
+from itertools import combinations
+
+import numpy as np
+
+from batch_game import Batch_Connect_4
+from distributed import Socket_Evaluator, run_worker
+from network import Network, Population
+
+num_workers = 3
+pop_size = 150
+
+if __name__ == '__main__':
+    networks = [Network() for _ in range(pop_size)]
+    pairings = list(combinations(range(pop_size), 2))
+    expected = Batch_Connect_4(Population(networks), pairings).run_game()
+
+    with Socket_Evaluator('127.0.0.1', 0, batch_size=256) as evaluator:
+        workers = [multiprocessing.Process(target=run_worker, args=evaluator.address, daemon=True)
+                   for _ in range(num_workers)]
+        for worker in workers:
+            worker.start()
+
+        start = time.perf_counter()
+        winners, num_moves = evaluator.play(networks, pairings)
+        print(f'{len(pairings) / (time.perf_counter() - start):,.0f} games/sec, '
+              f'matches local play: {np.array_equal(winners, expected)}')
+
+        # Lose a worker in the middle of the next generation
+        networks[0].mutate()
+        expected = Batch_Connect_4(Population(networks), pairings).run_game()
+        threading.Timer(.05, workers[0].kill).start()
+        winners, num_moves = evaluator.play(networks, pairings)
+        print(f'after losing a worker, matches local play: {np.array_equal(winners, expected)}')
+        print(evaluator.report())
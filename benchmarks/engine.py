@@ -0,0 +1,81 @@
+'''
+Moves per second of each Connect_4 engine and of Batch_Connect_4, on boards
+of every size in board_sizes, and games per second of a batched round robin
+between networks sized for the board
+
+Run from the repository root with `python -m benchmarks.engine`
+'''
+import random
+import time
+
+import numpy as np
+
+from batch_game import Batch_Connect_4
+from connect_4 import Connect_4, engines, max_moves
+from game_records import replay
+from network import Network, Population, board_layer_sizes
+
+board_sizes = [(6, 7), (10, 12), (20, 20)]
+
+
+def random_games(num_games, seed=0, num_rows=6, num_cols=7):
+    '''
+    Legal move sequences of random games, so every engine replays the same plays
+    '''
+    rng = random.Random(seed)
+    games = []
+    for _ in range(num_games):
+        heights = [0] * num_cols
+        moves = []
+        for _ in range(max_moves((num_rows, num_cols))):
+            col = rng.choice([c for c in range(num_cols) if heights[c] < num_rows])
+            heights[col] += 1
+            moves.append(col)
+        games.append(moves)
+    return games
+
+
+def moves_per_second(engine, games, game_board_size=(6, 7)):
+    start = time.perf_counter()
+    num_moves = 0
+    for moves in games:
+        game = Connect_4(replay(moves), headless=True, printing=False, engine=engine, game_board_size=game_board_size)
+        game.run_game()
+        num_moves += len(game.gamestate.game_moves)
+    return num_moves / (time.perf_counter() - start)
+
+
+def batched_moves_per_second(games, game_board_size=(6, 7)):
+    '''
+    The same games replayed in lockstep
+    '''
+    moves = np.array(games)
+    batch = Batch_Connect_4(None, np.zeros((len(games), 2), dtype=np.int64), game_board_size)
+
+    def policy(players, boards):
+        playing = np.flatnonzero(batch.active)
+        return moves[playing, batch.num_moves[playing]]
+    batch.policy = policy
+    start = time.perf_counter()
+    batch.run_game()
+    return batch.num_moves.sum() / (time.perf_counter() - start)
+
+
+def network_games_per_second(game_board_size, num_networks=50):
+    networks = [Network(layer_sizes=board_layer_sizes(game_board_size)) for _ in range(num_networks)]
+    pairings = [(first, second) for first in range(num_networks) for second in range(num_networks) if first != second]
+    start = time.perf_counter()
+    Batch_Connect_4(Population(networks), pairings, game_board_size).run_game()
+    return len(pairings) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    for game_board_size in board_sizes:
+        # About the same number of moves on every board
+        num_games = 2000 * 42 // (game_board_size[0] * game_board_size[1])
+        games = random_games(max(num_games, 200), 0, *game_board_size)
+        print(f'{game_board_size[0]}x{game_board_size[1]}')
+        for engine in engines:
+            print(f'{engine:>10}: {moves_per_second(engine, games, game_board_size):12,.0f} moves/sec')
+        print(f'{"batched":>10}: {batched_moves_per_second(games, game_board_size):12,.0f} moves/sec')
+        print(f'{"networks":>10}: {network_games_per_second(game_board_size):12,.0f} games/sec')
@@ -0,0 +1,56 @@
+'''
+Cost of archiving every generation's best networks in a hall_of_fame file:
+appending, opening, random access by generation and rank, and loading a
+slice of generations into a Population, plus the disk use of long runs
+
+Run from the repository root with `python -m benchmarks.hall_of_fame`
+'''
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from hall_of_fame import Hall_Of_Fame_Writer, Hall_Of_Fame
+from network import Network
+
+num_generations = 5000
+top_k = 5
+num_lookups = 10000
+slice_generations = 200
+
+if __name__ == '__main__':
+    networks = [Network() for _ in range(top_k)]
+    best = [(network, float(score)) for score, network in enumerate(networks)]
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'hall_of_fame')
+
+        start = time.perf_counter()
+        with Hall_Of_Fame_Writer(location, networks[0].layout(), top_k) as writer:
+            for generation in range(num_generations):
+                writer.add(generation, best)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(location)
+        per_generation = size / num_generations
+        print(f'append: {num_generations / elapsed:10,.0f} generations/sec, '
+              f'{per_generation / 1024:.1f} KB per generation, {size / 2 ** 20:.1f} MB total')
+        print(f'        100k generations take {per_generation * 100000 / 2 ** 30:.2f} GB')
+
+        start = time.perf_counter()
+        archive = Hall_Of_Fame(location)
+        print(f'open:   {(time.perf_counter() - start) * 1e3:10.2f} ms')
+
+        rng = np.random.default_rng(0)
+        generations = rng.integers(0, num_generations, num_lookups).tolist()
+        ranks = rng.integers(0, top_k, num_lookups).tolist()
+        start = time.perf_counter()
+        for generation, rank in zip(generations, ranks):
+            archive.network(generation, rank)
+        print(f'lookup: {(time.perf_counter() - start) / num_lookups * 1e6:10.2f} us per random network')
+
+        start = time.perf_counter()
+        for first in rng.integers(0, num_generations - slice_generations, 20).tolist():
+            population = archive.population(first, first + slice_generations)
+            population.forward(np.arange(len(population)), np.zeros((len(population), 6, 7)))
+        elapsed = (time.perf_counter() - start) / 20
+        print(f'slice:  {elapsed * 1e3:10.2f} ms to load and run {slice_generations * top_k} champions')
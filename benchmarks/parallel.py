@@ -0,0 +1,40 @@
+'''
+Round-robin throughput of the process pool evaluator for different worker counts
+
+Run from the repository root with `python -m benchmarks.parallel`
+'''
+import multiprocessing
+import time
+from itertools import combinations
+
+from batch_game import Batch_Connect_4, score_games
+from network import Network, Population
+from parallel import Process_Evaluator
+
+
+def games_per_second(rate, networks, pairings, repeats=3):
+    # The first call starts the pool
+    rate(networks, pairings)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rate(networks, pairings)
+    return repeats * len(pairings) / (time.perf_counter() - start)
+
+
+def rate_in_process(networks, pairings):
+    winners = Batch_Connect_4(Population(networks), pairings).run_game()
+    return score_games(pairings, winners, len(networks))
+
+
+if __name__ == '__main__':
+    networks = [Network() for _ in range(150)]
+    pairings = list(combinations(range(len(networks)), 2))
+
+    single = games_per_second(rate_in_process, networks, pairings)
+    print(f'{"in process":>12}: {single:10,.0f} games/sec')
+    num_workers = 1
+    while num_workers <= multiprocessing.cpu_count():
+        with Process_Evaluator(num_workers=num_workers) as evaluator:
+            rate = games_per_second(evaluator.rate, networks, pairings)
+        print(f'{num_workers:>4} workers: {rate:10,.0f} games/sec ({rate / single:.2f}x)')
+        num_workers *= 2
@@ -0,0 +1,73 @@
+'''
+How often each low precision mode picks a different move than the float64
+network, and how fast it picks them
+
+Run from the repository root with `python -m benchmarks.quantization [model ...]`,
+models are loaded from the given paths, random networks are used without any.
+'''
+import sys
+import time
+
+import numpy as np
+
+from network import Network, Population
+from quantize import modes, hidden_activations, Quantized_Network, Quantized_Population
+from benchmarks.engine import random_games
+
+
+def positions(num_games, seed=0):
+    '''
+    Every board reached in random games, as the networks see them
+    '''
+    boards = []
+    for moves in random_games(num_games, seed=seed):
+        board = np.zeros((6, 7)) - 1
+        heights = [0] * 7
+        for turn, col in enumerate(moves):
+            boards.append(board.copy())
+            board[5 - heights[col], col] = turn % 2
+            heights[col] += 1
+    return np.array(boards)
+
+
+def compare(networks, boards):
+    '''
+    Disagreement with the float64 moves and batched boards per second of every mode
+    '''
+    indexes = np.arange(len(boards)) % len(networks)
+    reference = Population(networks)
+    start = time.perf_counter()
+    expected = reference(indexes, boards)
+    results = {('float64', 'sigmoid'): (0., len(boards) / (time.perf_counter() - start))}
+    for mode in modes[1:]:
+        for activation in hidden_activations:
+            population = Quantized_Population(networks, mode, activation)
+            start = time.perf_counter()
+            moves = population(indexes, boards)
+            elapsed = time.perf_counter() - start
+            results[mode, activation] = (float(np.mean(moves != expected)), len(boards) / elapsed)
+    return results
+
+
+def single_boards_per_second(network, boards, mode='float64'):
+    player = network if mode == 'float64' else Quantized_Network(network, mode)
+    start = time.perf_counter()
+    for board in boards:
+        player(board)
+    return len(boards) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        networks = [Network.load(location) for location in sys.argv[1:]]
+    else:
+        networks = [Network() for _ in range(20)]
+    boards = positions(2000)
+    print(f'{len(boards)} positions, {len(networks)} networks')
+    for (mode, activation), (disagreement, speed) in compare(networks, boards).items():
+        print(f'{mode:>8} {activation:>13}: {disagreement:8.3%} moves changed {speed:14,.0f} boards/sec batched')
+    for mode in modes:
+        print(f'{mode:>8}: {single_boards_per_second(networks[0], boards[:5000], mode):14,.0f} boards/sec one at a time')
+    sizes = {mode: sum(array.nbytes for array in Quantized_Network(networks[0], mode).weights) for mode in modes[1:]}
+    sizes['float64'] = sum(layer.weights.size * 8 for layer in networks[0].layers)
+    print('weight bytes: ' + ', '.join(f'{mode} {size:,}' for mode, size in sizes.items()))
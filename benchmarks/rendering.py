@@ -0,0 +1,77 @@
+'''
+Frame times of the pygame front-end, redrawing everything each frame
+against the glyph cache and dirty rectangles of render.py
+
+Runs on SDL's dummy video driver, so no window is needed. Run from the
+repository root with `python -m benchmarks.rendering`
+'''
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import time
+
+import pygame
+
+from render import Renderer
+
+WHITE, HOVER, LIGHT, YELLOW, RED = (255, 255, 255), (200, 200, 200), (30, 30, 30), (255, 255, 0), (255, 0, 0)
+buttons = {'New Game': [735, 500, 250, 70], 'Undo': [735, 410, 250, 70]}
+turn_panel = [735, 110, 250, 70]
+
+
+def full_frame(screen, hover, yellow_turn):
+    '''
+    What loop.py drew for every event before render.py
+    '''
+    def text(label, x, y, shade):
+        font = pygame.font.SysFont('arial', 40)
+        screen.blit(font.render(str(label), True, shade), (x, y))
+    for label, rect in buttons.items():
+        pygame.draw.rect(screen, HOVER if hover == label else WHITE, rect)
+        text(label, rect[0] + 25, rect[1] + 12, LIGHT)
+    pygame.draw.rect(screen, YELLOW if yellow_turn else RED, turn_panel)
+    text('Yellow Turn' if yellow_turn else 'Red Turn', 750, 122, LIGHT)
+    pygame.display.update()
+
+
+def dirty_frame(renderer, state, hover, yellow_turn):
+    '''
+    The same frame, drawing only what changed since the last one
+    '''
+    for label, rect in buttons.items():
+        button_state = hover == label
+        if state.get(label) != button_state:
+            state[label] = button_state
+            renderer.rect(HOVER if button_state else WHITE, rect)
+            renderer.text(label, rect[0] + 25, rect[1] + 12, LIGHT)
+    if state.get('turn') != yellow_turn:
+        state['turn'] = yellow_turn
+        renderer.rect(YELLOW if yellow_turn else RED, turn_panel)
+        renderer.text('Yellow Turn' if yellow_turn else 'Red Turn', 750, 122, LIGHT)
+    renderer.update()
+
+
+def frames(num_frames):
+    '''
+    Hover and turn of each frame, mostly idle with a move every 30 frames
+    '''
+    for frame in range(num_frames):
+        hover = 'Undo' if frame // 50 % 2 else None
+        yield hover, frame // 30 % 2 == 0
+
+
+def frame_time(draw, num_frames=600):
+    start = time.perf_counter()
+    for hover, yellow_turn in frames(num_frames):
+        draw(hover, yellow_turn)
+    return (time.perf_counter() - start) / num_frames
+
+
+if __name__ == '__main__':
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 600))
+    full = frame_time(lambda hover, yellow_turn: full_frame(screen, hover, yellow_turn))
+    renderer, state = Renderer(screen), {}
+    dirty = frame_time(lambda hover, yellow_turn: dirty_frame(renderer, state, hover, yellow_turn))
+    print(f'full redraw: {full * 1e3:8.3f} ms/frame')
+    print(f'      dirty: {dirty * 1e3:8.3f} ms/frame ({full / dirty:.1f}x)')
+    pygame.quit()
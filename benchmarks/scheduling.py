@@ -0,0 +1,47 @@
+'''
+Games played against rank accuracy for each tournament schedule and rating model,
+measured against a full round robin scoreboard
+
+Run from the repository root with `python -m benchmarks.scheduling`
+'''
+import numpy as np
+
+from batch_game import Batch_Connect_4
+from network import Network, Population
+from tournament import Round_Robin, Random_Opponents, Group_Round_Robin, Swiss, \
+    rating_models, run_tournament, rank_accuracy, run_racing
+
+pop_size = 150
+top_k = 5
+num_trials = 5
+
+if __name__ == '__main__':
+    population = Population([Network() for _ in range(pop_size)])
+
+    def play(pairings):
+        return Batch_Connect_4(population, pairings).run_game()
+
+    reference, full_games = run_tournament(play, pop_size, Round_Robin(), rating_models['scoreboard'])
+    print(f'{"schedule":>20} {"rating":>10} {"games":>7} {"spearman":>9} {f"top {top_k}":>6}')
+    strategies = {'random_opponents k=5': lambda seed: Random_Opponents(5, seed),
+                  'random_opponents k=20': lambda seed: Random_Opponents(20, seed),
+                  'groups of 10': lambda seed: Group_Round_Robin(10, seed),
+                  'groups of 30': lambda seed: Group_Round_Robin(30, seed),
+                  'swiss': lambda seed: Swiss(rng=seed)}
+    for name, scheduler in strategies.items():
+        for rating in rating_models:
+            results = []
+            for seed in range(num_trials):
+                ratings, num_games = run_tournament(play, pop_size, scheduler(seed), rating_models[rating])
+                results.append((num_games,) + rank_accuracy(ratings.ratings, reference.ratings, top_k))
+            games, spearman, top = np.mean(results, axis=0)
+            print(f'{name:>20} {rating:>10} {games:7.0f} {spearman:9.3f} {top:6.2f}')
+    for delta in (.05, .2, .5):
+        results = []
+        for seed in range(num_trials):
+            ratings, num_games = run_racing(play, pop_size, top_k, delta, rng=seed)
+            results.append((num_games,) + rank_accuracy(ratings.ranking, reference.ratings, top_k))
+        games, spearman, top = np.mean(results, axis=0)
+        print(f'{f"racing delta={delta}":>20} {"mean":>10} {games:7.0f} {spearman:9.3f} {top:6.2f}'
+              f'  ({1 - games / full_games:.0%} of games saved)')
+    print(f'{"round_robin":>20} {"scoreboard":>10} {full_games:7d} {1:9.3f} {1:6.2f}')
@@ -0,0 +1,73 @@
+'''
+Startup cost of a fresh interpreter, paid again by every spawned worker
+
+Each measurement runs in a new process: the time to import a module, and
+for the game modules the time from starting the import to finishing a first
+headless game. Also reports whether pygame was imported along the way.
+
+Run from the repository root with `python -m benchmarks.startup`
+'''
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+probe = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{first_game}
+done = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'first_game': done - start if {has_game} else None,
+                   'pygame': 'pygame' in sys.modules}}))
+'''
+
+first_game = '''
+from connect_4 import Connect_4
+from network import Network
+Connect_4([Network(), Network()], headless=True, printing=False, engine='bitboard').run_game()
+'''
+
+modules = ['network', 'connect_4', 'batch_game', 'trainer', 'pygame']
+
+
+def measure(module, repeat=5):
+    has_game = module in ('connect_4', 'trainer')
+    code = probe.format(module=module, first_game=first_game if has_game else '', has_game=has_game)
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        runs.append(dict(json.loads(output.strip().splitlines()[-1]), process=time.perf_counter() - start))
+    result = {'pygame': runs[0]['pygame']}
+    for key in ('import', 'first_game', 'process'):
+        if runs[0][key] is not None:
+            result[key] = statistics.median(run[key] for run in runs)
+    return result
+
+
+def interpreter_time(repeat=5):
+    '''
+    Seconds to start and stop an interpreter that imports nothing
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+if __name__ == '__main__':
+    print(f'{"interpreter":>12}: {interpreter_time() * 1e3:8.1f} ms process')
+    for module in modules:
+        result = measure(module)
+        line = f'{module:>12}: {result["import"] * 1e3:8.1f} ms import'
+        if 'first_game' in result:
+            line += f', {result["first_game"] * 1e3:8.1f} ms to first game'
+        line += f', {result["process"] * 1e3:8.1f} ms process'
+        if module != 'pygame':
+            line += ', imports pygame' if result['pygame'] else ', no pygame'
+        print(line)
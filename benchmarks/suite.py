@@ -0,0 +1,228 @@
+'''
+Microbenchmarks of the engine, network and trainer hot paths
+
+Run from the repository root with `python -m benchmarks.suite`. Results are
+written as json and compared against a stored baseline, any benchmark slower
+than the baseline by more than the threshold is reported as a regression.
+The committed benchmarks/baseline.json is only a reference from one machine,
+record one on the machine the comparisons run on before relying on them.
+
+    python -m benchmarks.suite --save-baseline      # record benchmarks/baseline.json
+    python -m benchmarks.suite -k network           # only benchmarks with network in the name
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from contextlib import contextmanager
+
+import numpy as np
+
+import trainer
+from connect_4 import Connect_4, _Interface, engines
+from mutation import Mutator, default_mutator
+from network import Layer, Network, Population
+from quantize import Quantized_Population
+from search import Negamax_Player
+from game_records import replay
+from benchmarks.engine import random_games
+
+default_baseline = os.path.join(os.path.dirname(__file__), 'baseline.json')
+seed = 0
+
+
+def reseed():
+    random.seed(seed)
+    default_mutator.rng = np.random.default_rng(seed)
+
+
+def engine_benchmarks():
+    games = random_games(200, seed=seed)
+    interface = _Interface([None, None], printing=False)
+    num_moves = sum(len(moves) for moves in games)
+
+    for name, gamestate in engines.items():
+        def play_turns(gamestate=gamestate):
+            for moves in games:
+                state = gamestate(interface, printing=False)
+                for turn, move in enumerate(moves):
+                    state.current_player = turn % 2
+                    state.play_turn(move)
+        yield f'engine.play_turn.{name}', play_turns, num_moves, 'move'
+
+    # Check every stone of a full board
+    numpy_state = engines['numpy'](interface, printing=False)
+    bitboard_state = engines['bitboard'](interface, printing=False)
+    for turn, move in enumerate(games[0]):
+        for state in (numpy_state, bitboard_state):
+            state.current_player = turn % 2
+            state.play_turn(move)
+    stones = [(row, col) for row, col in zip(*np.nonzero(numpy_state.game_board != -1))]
+
+    def numpy_check_win():
+        for row, col in stones:
+            numpy_state.current_player = int(numpy_state.game_board[row, col])
+            numpy_state._check_win(row, col)
+    yield 'engine._check_win.numpy', numpy_check_win, len(stones), 'check'
+
+    def bitboard_check_win():
+        for row, col in stones:
+            bitboard_state._check_win()
+    yield 'engine._check_win.bitboard', bitboard_check_win, len(stones), 'check'
+
+
+def network_benchmarks():
+    reseed()
+    network = Network()
+    board = np.random.default_rng(seed).integers(-1, 2, (6, 7)).astype(float)
+    yield 'network.forward.single', lambda: network.forward(board), 1, 'board'
+
+    population_networks = [Network() for _ in range(100)]
+    population = Population(population_networks)
+    rng = np.random.default_rng(seed)
+    for batch_size in (64, 4096):
+        boards = rng.integers(-1, 2, (batch_size, 6, 7)).astype(float)
+        indexes = rng.integers(0, len(population), batch_size)
+        yield f'network.forward.batched[{batch_size}]', \
+            lambda boards=boards, indexes=indexes: population.forward(indexes, boards), batch_size, 'board'
+    for mode in ('float32', 'int8'):
+        quantized = Quantized_Population(population_networks, mode)
+        yield f'network.forward.batched.{mode}[{batch_size}]', \
+            lambda quantized=quantized, boards=boards, indexes=indexes: quantized.forward(indexes, boards), \
+            batch_size, 'board'
+
+    layer = Layer(42, 32)
+    yield 'layer.mutate', lambda: layer.mutate(mutation_rate=1e-5), 1, 'layer'
+    mutator = Mutator(mutation_rate=1e-5, seed=seed)
+    networks = [Network() for _ in range(150)]
+    yield 'mutator.mutate_population[150]', lambda: mutator.mutate_population(networks), 150, 'network'
+
+
+def game_benchmarks():
+    reseed()
+    first, second = Network(), Network()
+    for name in engines:
+        def play(name=name):
+            Connect_4([first, second], headless=True, printing=False, engine=name).run_game()
+        yield f'game.headless.{name}', play, 1, 'game'
+
+    for depth in (2, 4):
+        def search_game(depth=depth):
+            # A new player each game, so the transposition table starts empty
+            Connect_4([Negamax_Player(depth), Negamax_Player(depth - 1)], headless=True, printing=False,
+                      engine='bitboard').run_game()
+        yield f'game.negamax[{depth}]', search_game, 1, 'game'
+
+    games = random_games(100, seed=seed)
+    yield 'game.replay.bitboard', \
+        lambda: [Connect_4(replay(moves), headless=True, printing=False, engine='bitboard').run_game()
+                 for moves in games], len(games), 'game'
+
+
+@contextmanager
+def population_size(pop_size):
+    '''
+    Run the trainer with pop_size networks, restoring its settings afterwards
+    '''
+    saved = trainer.pop_size, trainer.population_size
+    trainer.pop_size = pop_size
+    trainer.population_size = trainer.num_surviving * (pop_size // trainer.num_surviving + 10)
+    try:
+        yield
+    finally:
+        trainer.pop_size, trainer.population_size = saved
+
+
+def trainer_benchmarks():
+    for pop_size in (20, 50, 100):
+        def setup(pop_size=pop_size):
+            reseed()
+            with population_size(pop_size):
+                mutator = Mutator(mutation_rate=trainer.mutation_rate, seed=seed)
+                arena, population = trainer.new_population()
+                state = [trainer.run_generation(arena, population, mutator)[0]]
+
+            def generation():
+                with population_size(pop_size):
+                    state[0] = trainer.run_generation(arena, state[0], mutator)[0]
+            return generation
+        yield f'trainer.generation[{pop_size}]', setup, 1, 'generation'
+
+
+def measure(func, repeat, min_time):
+    '''
+    Seconds per call of each repeat, with enough calls per repeat to take min_time
+    '''
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    return [elapsed / number for elapsed in timer.repeat(repeat, number)]
+
+
+def run(name_filter=None, repeat=5, min_time=.1):
+    results = {}
+    for group in (engine_benchmarks, network_benchmarks, game_benchmarks, trainer_benchmarks):
+        for name, func, ops, unit in group():
+            if name_filter and name_filter not in name:
+                continue
+            if name.startswith('trainer.'):
+                # Building the population is setup, not part of the timed generation
+                func = func()
+            times = [seconds / ops for seconds in measure(func, repeat, min_time)]
+            results[name] = {'seconds': statistics.median(times), 'best': min(times),
+                             'per_second': 1 / statistics.median(times), 'unit': unit}
+            print(f'{name:>34}: {results[name]["per_second"]:14,.1f} {unit}s/sec', file=sys.stderr)
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'machine': platform.machine(), 'processor': platform.processor(),
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': seed},
+            'results': results}
+
+
+def compare(results, baseline, threshold):
+    '''
+    returns a line per benchmark in both and the names of those that regressed
+    '''
+    lines, regressions = [], []
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['seconds'] / baseline['results'][name]['seconds']
+        status = ''
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = 'improved'
+        lines.append(f'{name:>34}: {ratio:6.2f}x baseline time {status}')
+    return lines, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='name_filter', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--output', default='bench_output.json', help='Where to write the results')
+    parser.add_argument('--baseline', default=default_baseline, help='Results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=.2, help='Slowdown reported as a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=.1, help='Seconds per repeat')
+    args = parser.parse_args()
+
+    results = run(args.name_filter, args.repeat, args.min_time)
+    with open(args.baseline if args.save_baseline else args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            lines, regressions = compare(results, json.load(file), args.threshold)
+        print('\n'.join(lines))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,127 @@
+'''
+Compact model files and training checkpoints
+
+A model file holds N flat float32 genomes, each the weights and bias of every
+layer in order, after a small header:
+
+    magic (4 bytes) | format version (uint32) | json length (uint32) | json | padding
+
+The json has the layer shapes and any metadata, and the genomes start at the
+next multiple of 64 bytes so they can be memory mapped.
+'''
+import json
+import os
+import re
+import struct
+import tempfile
+
+import numpy as np
+
+magic = b'C4NN'
+format_version = 1
+alignment = 64
+_prefix = struct.Struct('<4sII')
+
+
+def write_genomes(location, genomes, layout, metadata=None):
+    '''
+    Atomically write genomes to location
+        genomes: (N, genome_length) array
+        layout: Shape of each weight and bias array of a genome
+    '''
+    genomes = np.ascontiguousarray(genomes, dtype=np.float32).reshape(len(genomes), -1)
+    header = pack_header({'layout': [list(shape) for shape in layout],
+                          'num_genomes': len(genomes),
+                          'metadata': metadata or {}})
+
+    # Write next to the target and rename over it, so a crash never leaves a partial file
+    directory = os.path.dirname(os.path.abspath(location))
+    fd, temp_location = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+    os.fchmod(fd, 0o644)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(header)
+            file.write(genomes.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_location, location)
+    except BaseException:
+        os.unlink(temp_location)
+        raise
+
+
+def is_genome_file(location):
+    with open(location, 'rb') as file:
+        return file.read(len(magic)) == magic
+
+
+def pack_header(header, file_magic=magic, version=format_version):
+    '''
+    The prefix, json and padding up to the first record of a file, which is
+    aligned so the records can be memory mapped
+    '''
+    header = json.dumps(header).encode()
+    offset = _prefix.size + len(header)
+    return _prefix.pack(file_magic, version, len(header)) + header + b'\0' * (-offset % alignment)
+
+
+def read_header(location, file_magic=magic, version=format_version, kind='genome'):
+    '''
+    returns the json header and the offset of the genomes, or of the first
+    record of a file written with another file_magic and version
+    '''
+    with open(location, 'rb') as file:
+        prefix = file.read(_prefix.size)
+        if len(prefix) < _prefix.size or _prefix.unpack(prefix)[0] != file_magic:
+            raise ValueError(f'{location} is not a {kind} file')
+        _, file_version, length = _prefix.unpack(prefix)
+        if file_version != version:
+            raise ValueError(f'{location} has format version {file_version}, expected {version}')
+        header = json.loads(file.read(length))
+    offset = _prefix.size + length
+    return header, offset + (-offset % alignment)
+
+
+def read_genomes(location, mmap=True):
+    '''
+    returns the (N, genome_length) float32 genomes, their layout and the metadata
+    '''
+    header, offset = read_header(location)
+    layout = [tuple(shape) for shape in header['layout']]
+    genome_length = sum(int(np.prod(shape)) for shape in layout)
+    shape = (header['num_genomes'], genome_length)
+    if mmap:
+        genomes = np.memmap(location, dtype=np.float32, mode='r', offset=offset, shape=shape)
+    else:
+        genomes = np.fromfile(location, dtype=np.float32, offset=offset).reshape(shape)
+    return genomes, layout, header['metadata']
+
+
+def checkpoint_name(generation):
+    return f'checkpoint_{generation:08d}.c4nn'
+
+
+def save_checkpoint(directory, generation, genomes, layout, metadata=None, keep=2):
+    '''
+    Write the checkpoint for a generation and remove all but the latest `keep`
+    '''
+    os.makedirs(directory, exist_ok=True)
+    metadata = dict(metadata or {}, generation=generation)
+    write_genomes(os.path.join(directory, checkpoint_name(generation)), genomes, layout, metadata)
+    for old in list_checkpoints(directory)[:-keep]:
+        os.remove(old)
+
+
+def list_checkpoints(directory):
+    '''
+    Checkpoints in the directory, oldest first
+    '''
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if re.fullmatch(r'checkpoint_\d+\.c4nn', name))
+    return [os.path.join(directory, name) for name in names]
+
+
+def latest_checkpoint(directory):
+    checkpoints = list_checkpoints(directory)
+    return checkpoints[-1] if checkpoints else None
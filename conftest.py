@@ -0,0 +1 @@
+# Lets pytest import the modules at the repository root from tests/
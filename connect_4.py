@@ -1,24 +1,83 @@
-import pygame
-import pygame.display as display
-import pygame.time as time
+import functools
+
 import numpy as np
 import threading
 
+default_game_board_size = (6, 7)
+# Stones in a line needed to win
+default_connect = 4
+
+
+def max_moves(game_board_size):
+    '''
+    Stones on the board when the game is a draw, one short of a full board
+    '''
+    num_rows, num_cols = game_board_size
+    return num_rows * num_cols - 1
+
+
+@functools.lru_cache(maxsize=None)
+def line_table(game_board_size, connect=default_connect):
+    '''
+    Flat (row * num_cols + col) indexes of every line of connect cells through
+    each cell, as a (num_rows * num_cols, max_lines, connect) array. Lines run
+    vertically, horizontally and down-right; cells on fewer than max_lines
+    lines repeat their first one.
+    '''
+    num_rows, num_cols = game_board_size
+    if connect > max(num_rows, num_cols):
+        raise ValueError(f'No line of {connect} fits on a {num_rows}x{num_cols} board')
+    lines = [[] for _ in range(num_rows * num_cols)]
+    for row_step, col_step in ((1, 0), (0, 1), (1, 1)):
+        for row in range(num_rows - row_step * (connect - 1)):
+            for col in range(num_cols - col_step * (connect - 1)):
+                line = [(row + i * row_step) * num_cols + col + i * col_step for i in range(connect)]
+                for cell in line:
+                    lines[cell].append(line)
+    num_lines = max(len(cell_lines) for cell_lines in lines)
+    table = np.array([cell_lines + cell_lines[:1] * (num_lines - len(cell_lines)) for cell_lines in lines],
+                     dtype=np.intp)
+    table.flags.writeable = False
+    return table
+
+
+def win_shifts(num_rows, connect=default_connect):
+    '''
+    For each line direction of the bitboard layout, the shifts that leave a bit
+    set only where a line of connect stones starts, applied in turn as
+    run &= run >> shift. Runs double in length with each shift, so a line of
+    connect takes about log2(connect) of them.
+    '''
+    steps, length = [], 1
+    while 2 * length <= connect:
+        steps.append(length)
+        length *= 2
+    if length < connect:
+        steps.append(connect - length)
+    # Vertical, horizontal and down-right diagonal
+    return tuple(tuple(step * shift for step in steps) for shift in (1, num_rows + 1, num_rows))
+
+
 class Connect_4(object):
 
-    def __init__(self, inputCallback=[None, None], headless=False, printing=True, **args):
+    def __init__(self, inputCallback=[None, None], headless=False, printing=True, engine='numpy',
+                 game_board_size=default_game_board_size, connect=default_connect, **args):
         '''
             Constructor for Connect4
             inputCallback: The callback to run which will play a turn. If None, 
                 then wait for player input
             headless: Whether or not to use pygame as a gui
+            engine: Which gamestate to play on, 'numpy' or 'bitboard'
+            game_board_size: (num_rows, num_cols) of the board
+            connect: Stones in a line needed to win
         '''
         if headless:
             self.interface = _Interface(inputCallback, printing=printing, **args)
         else:
             self.interface = _Pygame_GUI(inputCallback, printing=printing, **args)
 
-        self.gamestate = _Connect_4_Gamestate(self.interface, printing=printing, **args)
+        self.gamestate = engines[engine](self.interface, game_board_size=game_board_size, connect=connect,
+                                         printing=printing)
     
     def run_game(self):
         return self.gamestate.run_game()
@@ -77,6 +136,9 @@ class _Pygame_GUI(_Interface):
 
         self.printing = printing
 
+        # Only the gui needs pygame, headless games never import it
+        import pygame.display as display
+        import pygame.time as time
         self.clock = time.Clock()
 
         # Make sure display is initialized
@@ -100,12 +162,16 @@ class _Pygame_GUI(_Interface):
 
 
 class _Connect_4_Gamestate(object):
-    default_game_board_size = (6,7)
+    default_game_board_size = default_game_board_size
 
-    def __init__(self, interface, game_board_size=default_game_board_size, printing=True):
+    def __init__(self, interface, game_board_size=default_game_board_size, connect=default_connect, printing=True):
         self.num_rows, self.num_cols = game_board_size # numpy is row major
+        self.connect = connect
+        self.max_moves = max_moves(game_board_size)
+        self.lines = line_table(tuple(game_board_size), connect)
         # Initialize board to -1
         self.game_board = np.zeros(game_board_size) - 1
+        self._cells = self.game_board.reshape(-1)
         self.game_moves = []
         self.current_player = 0
         # The winner -1 until one player wins, 0 for first player, 1 for second player
@@ -122,7 +188,7 @@ class _Connect_4_Gamestate(object):
         '''
         for player, get_turn in self.interface:
             # Ensure there is never a stalemate
-            if len(self.game_moves) == 41:
+            if len(self.game_moves) == self.max_moves:
                 self.print("Cat's game")
                 return -1
 
@@ -167,37 +233,117 @@ class _Connect_4_Gamestate(object):
         return False
             
     def _check_win(self, x, y):
-        # Check around the placed piece
-        for curr_y in range(-1, 1):
-            for curr_x in range(-1, 1):
-                # Don't check current place
-                if curr_y == 0 and curr_x == 0:
-                    pass
-                else:
-                    i = 1
-                    check_out = check_in = True
-                    # Check up to 4 pieces away
-                    for offset in range(1, 4):
-                        if check_in:
-                            to_check = x + offset * curr_x, y + offset * curr_y
-                            if to_check[0] < 0 or  to_check[1] < 0:
-                                check_in = False
-                            elif self.game_board[to_check] == self.current_player:
-                                i += 1
-                            else:
-                                check_in = False
-                        if check_out:
-                            to_check = x - offset * curr_x, y - offset * curr_y
-                            if to_check[0] >= self.num_rows or to_check[1] >= self.num_cols:
-                                check_out = False
-                            elif self.game_board[to_check] == self.current_player:
-                                i += 1
-                            else:
-                                check_out = False
-                    if i >= 4:
-                        return True
+        # Every line through the placed piece
+        stones = self._cells[self.lines[x * self.num_cols + y]]
+        return bool((stones == self.current_player).all(axis=1).any())
+
+
+class _Bitboard_Gamestate(_Connect_4_Gamestate):
+    '''
+    Same rules as _Connect_4_Gamestate, but each player's stones are kept in an
+    integer bitboard. Bit (col * (num_rows + 1) + height) is set when the player
+    has a stone `height` rows up from the bottom of `col`. The extra bit on top
+    of every column is always empty, so shifted lines never wrap columns.
+    '''
+
+    def __init__(self, interface, game_board_size=default_game_board_size, connect=default_connect, printing=True):
+        self.num_rows, self.num_cols = game_board_size
+        self.connect = connect
+        self.max_moves = max_moves(game_board_size)
+        # Python integers grow with the board, so any size fits
+        self.boards = [0, 0]
+        # The next free bit in each column
+        self.heights = [col * (self.num_rows + 1) for col in range(self.num_cols)]
+        # Same lines as _Connect_4_Gamestate: vertical, horizontal and down-right diagonal
+        self.shifts = win_shifts(self.num_rows, connect)
+        self.game_moves = []
+        self.current_player = 0
+        # The winner -1 until one player wins, 0 for first player, 1 for second player
+        self.winner = -1
+
+        # Numpy view of the board, only brought up to date when asked for
+        self._game_board = np.zeros(game_board_size) - 1
+        self._pending = []
+
+        self.interface = interface
+        self.printing = printing
+        if self.interface.printing:
+            self.interface.update_board(self.game_board)
+        self.turn_num = 0
+
+    @property
+    def game_board(self):
+        '''
+        The board as a numpy array of -1, 0 and 1
+        '''
+        for row, col, player in self._pending:
+            self._game_board[row, col] = player
+        self._pending.clear()
+        return self._game_board
+
+    def run_game(self):
+        '''
+        Play the entire game
+        '''
+        for player, get_turn in self.interface:
+            # Ensure there is never a stalemate
+            if len(self.game_moves) == self.max_moves:
+                self.print("Cat's game")
+                return -1
+
+            self.current_player = player
+            # Ensure there is not too many in a column
+            turn = get_turn(self.game_board)
+            if not self.play_turn(turn):
+                self.print("Invalid play")
+                return -1
+
+            # Successful so update the board
+            if self.interface.printing:
+                self.interface.update_board(self.game_board)
+            self.game_moves.append(turn)
+
+            if self.winner != -1:
+                break
+        self.print(f'Player {self.winner + 1} Won!')
+        return self.winner
+
+    def play_turn(self, column_num):
+        # Pass turn
+        if column_num is None:
+            return True
+
+        # Validate
+        if (not isinstance(column_num, int)) or \
+                column_num >= self.num_cols or \
+                column_num < 0:
+            return False
+
+        # Play the piece
+        bit = self.heights[column_num]
+        height = bit - column_num * (self.num_rows + 1)
+        if height == self.num_rows:
+            return False
+        self.heights[column_num] += 1
+        self.boards[self.current_player] |= 1 << bit
+        self._pending.append((self.num_rows - 1 - height, column_num, self.current_player))
+        if self._check_win():
+            self.winner = self.current_player
+        return True
+
+    def _check_win(self):
+        board = self.boards[self.current_player]
+        for shifts in self.shifts:
+            run = board
+            for shift in shifts:
+                run &= run >> shift
+            if run:
+                return True
         return False
-                                    
+
+
+engines = {'numpy': _Connect_4_Gamestate, 'bitboard': _Bitboard_Gamestate}
+
 if __name__ == '__main__':
     def create_callback(start):
         def func(arg):
@@ -0,0 +1,306 @@
+'''
+Tournament evaluation over TCP
+
+The coordinator (Socket_Evaluator) listens for workers, sends them the
+population's weights once per generation and hands out batches of pairings.
+A worker that disconnects or stops responding has its batch given to
+another one. Workers answer each batch with the winner and number of moves
+of every game.
+
+Every message is a 12 byte header of (json length, body length, unused) in
+network byte order, a json header and a raw body.
+
+Start a worker with `python distributed.py [host] [port]`
+'''
+import json
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from batch_game import Batch_Connect_4
+from connect_4 import default_game_board_size, default_connect
+from network import Population
+
+default_port = 5555
+_header = struct.Struct('!III')
+
+
+def send_message(sock, header, body=b''):
+    header = json.dumps(header).encode()
+    sock.sendall(_header.pack(len(header), len(body), 0) + header)
+    if len(body):
+        sock.sendall(body)
+
+
+def recv_message(sock):
+    '''
+    returns the json header and body of the next message, or (None, None) once the peer is gone
+    '''
+    lengths = _recv_exactly(sock, _header.size)
+    if lengths is None:
+        return None, None
+    header_length, body_length, _ = _header.unpack(lengths)
+    header = _recv_exactly(sock, header_length)
+    body = _recv_exactly(sock, body_length)
+    if header is None or body is None:
+        return None, None
+    return json.loads(header), body
+
+
+def _recv_exactly(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        num = sock.recv_into(view[received:])
+        if num == 0:
+            return None
+        received += num
+    return data
+
+
+class _Worker_Connection(object):
+    def __init__(self, sock, address, name):
+        self.sock = sock
+        self.address = address
+        self.name = name
+        self.version = None
+        self.alive = True
+        # Games, batches and busy seconds, replaced whole so stats() always reads a consistent set
+        self.counts = (0, 0, 0.)
+        self.connected = time.perf_counter()
+
+
+class Socket_Evaluator(object):
+    '''
+    Coordinator that plays tournaments on workers connected over TCP
+    '''
+
+    def __init__(self, host='127.0.0.1', port=default_port, batch_size=512, timeout=60,
+                 game_board_size=default_game_board_size, connect=default_connect, worker_timeout=300):
+        '''
+            Constructor for Socket_Evaluator
+            host, port: Where to listen for workers
+            batch_size: Pairings per batch
+            timeout: Seconds a worker has to say hello or answer a batch before it is treated as lost
+            game_board_size, connect: Board the games are played on, sent to the workers with the weights
+            worker_timeout: Seconds play waits without any live worker before it raises
+        '''
+        self.batch_size = batch_size
+        self.game_board_size = tuple(game_board_size)
+        self.connect = connect
+        self.timeout = timeout
+        self.worker_timeout = worker_timeout
+        self.workers = []
+
+        self.tasks = queue.Queue()
+        self.results = {}
+        # Batches of an earlier call to play that gave up are dropped
+        self.round = 0
+        self.done = threading.Condition()
+        # Weights of the current generation
+        self.version = 0
+        self.weights_header = None
+        self.weights_body = None
+
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()
+        self.closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                sock, address = self.server.accept()
+            except OSError:
+                return
+            # The hello is read on the worker's own thread, so a silent client can't hold up the others
+            threading.Thread(target=self._serve, args=(sock, address), daemon=True).start()
+
+    def _handshake(self, sock, address):
+        '''
+        The connection of a client that says hello within the timeout, None for anything else
+        '''
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        try:
+            header, _ = recv_message(sock)
+        except (OSError, ValueError):
+            header = None
+        if header is None or header.get('type') != 'hello':
+            sock.close()
+            return None
+        worker = _Worker_Connection(sock, address, header.get('name', f'{address[0]}:{address[1]}'))
+        self.workers.append(worker)
+        with self.done:
+            self.done.notify_all()
+        return worker
+
+    def _serve(self, sock, address):
+        '''
+        Hand batches to one worker until it is lost or the evaluator is closed
+        '''
+        worker = self._handshake(sock, address)
+        if worker is None:
+            return
+        try:
+            while not self.closed:
+                try:
+                    task = self.tasks.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if task is None:
+                    break
+                version, play_round, batch_id, pairings = task
+                if play_round != self.round:
+                    continue
+                try:
+                    start = time.perf_counter()
+                    if worker.version != version:
+                        send_message(worker.sock, self.weights_header, self.weights_body)
+                        worker.version = version
+                    send_message(worker.sock, {'type': 'batch', 'id': batch_id}, pairings.tobytes())
+                    header, body = recv_message(worker.sock)
+                    if header is None:
+                        raise ConnectionError(f'Worker {worker.name} closed the connection')
+                    # A winner and a number of moves for every pairing
+                    if not isinstance(header, dict) or header.get('id') != batch_id \
+                            or len(body) != 16 * len(pairings):
+                        raise ValueError(f'Worker {worker.name} sent a malformed result')
+                except (OSError, ValueError):
+                    # Give the batch to someone else, and drop a worker that can't be trusted with more
+                    self.tasks.put(task)
+                    break
+                games, batches, busy_time = worker.counts
+                worker.counts = (games + len(pairings), batches + 1, busy_time + time.perf_counter() - start)
+                with self.done:
+                    if play_round == self.round:
+                        self.results[batch_id] = np.frombuffer(body, dtype=np.int64).reshape(2, -1)
+                    self.done.notify_all()
+        finally:
+            worker.alive = False
+            worker.sock.close()
+            with self.done:
+                self.done.notify_all()
+
+    def publish(self, networks):
+        '''
+        Serialize the weights of the networks once for every worker
+        '''
+        population = Population(networks)
+        arrays = population.weights + population.biases
+        body = b''.join(np.ascontiguousarray(array, dtype=np.float32).tobytes() for array in arrays)
+        if body != self.weights_body:
+            self.version += 1
+            self.weights_header = {'type': 'weights', 'version': self.version,
+                                   'layout': [array.shape for array in arrays],
+                                   'game_board_size': self.game_board_size, 'connect': self.connect}
+            self.weights_body = body
+
+    def play(self, networks, pairings):
+        '''
+        Winner and number of moves of every pairing
+        '''
+        pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+        self.publish(networks)
+        starts = range(0, len(pairings), self.batch_size)
+        with self.done:
+            self.round += 1
+            self.results = {}
+        for batch_id, start in enumerate(starts):
+            self.tasks.put((self.version, self.round, batch_id, pairings[start:start + self.batch_size]))
+        with self.done:
+            # Give up once there has been no live worker for worker_timeout seconds
+            alone_since = None
+            while len(self.results) < len(starts):
+                if any(worker.alive for worker in self.workers):
+                    alone_since = None
+                elif alone_since is None:
+                    alone_since = time.perf_counter()
+                elif time.perf_counter() - alone_since > self.worker_timeout:
+                    self.round += 1
+                    raise ConnectionError(f'No worker connected to {self.address[0]}:{self.address[1]} '
+                                          f'for {self.worker_timeout}s, {len(self.results)} of {len(starts)} '
+                                          f'batches played')
+                self.done.wait(timeout=1)
+            results = [self.results[batch_id] for batch_id in range(len(starts))]
+        results = np.concatenate(results, axis=1) if results else np.zeros((2, 0), dtype=np.int64)
+        return results[0], results[1]
+
+    def stats(self):
+        '''
+        Games played and throughput of every worker that has connected
+        '''
+        now = time.perf_counter()
+        stats = []
+        for worker in list(self.workers):
+            games, batches, busy_time = worker.counts
+            stats.append({'name': worker.name, 'alive': worker.alive, 'games': games, 'batches': batches,
+                          'busy_seconds': busy_time, 'games_per_second': games / busy_time if busy_time else 0.,
+                          'utilization': busy_time / (now - worker.connected)})
+        return stats
+
+    def report(self):
+        lines = []
+        for stat in self.stats():
+            lines.append(f'{stat["name"]:>24} {"alive" if stat["alive"] else "lost":>5} '
+                         f'{stat["games"]:>10} games {stat["games_per_second"]:>10,.0f} games/sec')
+        return '\n'.join(lines)
+
+    def close(self):
+        self.closed = True
+        self.server.close()
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    send_message(worker.sock, {'type': 'close'})
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def run_worker(host='127.0.0.1', port=default_port, name=None):
+    '''
+    Play batches for a coordinator until it closes the connection
+    '''
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    send_message(sock, {'type': 'hello', 'name': name or f'{socket.gethostname()}:{sock.getsockname()[1]}'})
+    population = None
+    board = (default_game_board_size, default_connect)
+    with sock:
+        while True:
+            header, body = recv_message(sock)
+            if header is None or header['type'] == 'close':
+                return
+            if header['type'] == 'weights':
+                arrays, offset = [], 0
+                for shape in header['layout']:
+                    array = np.frombuffer(body, dtype=np.float32, count=int(np.prod(shape)), offset=offset)
+                    arrays.append(array.reshape(shape))
+                    offset += array.nbytes
+                num_layers = len(arrays) // 2
+                population = Population.from_arrays(arrays[:num_layers], arrays[num_layers:])
+                board = (tuple(header.get('game_board_size', default_game_board_size)),
+                         header.get('connect', default_connect))
+            elif header['type'] == 'batch':
+                pairings = np.frombuffer(body, dtype=np.int64).reshape(-1, 2)
+                games = Batch_Connect_4(population, pairings, *board)
+                results = np.stack([games.run_game(), games.num_moves]).astype(np.int64)
+                send_message(sock, {'type': 'result', 'id': header['id']}, results.tobytes())
+
+
+if __name__ == '__main__':
+    host = sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else default_port
+    run_worker(host, port)
@@ -3,6 +3,8 @@ import pygame.display as display
 import pygame.time as time
 import re
 
+from render import Renderer
+
 class Controller(object):
     def __init__(self, game_board, w=700):
         '''
@@ -15,6 +17,7 @@ class Controller(object):
         self.radius = w/14
 
         self.game_display = pygame.display.set_mode((self.w, self.h))
+        self.renderer = Renderer(self.game_display)
         self.game_board = game_board
         self.colors = {'red':(255,0,0),\
                        'yellow':(255,255,0),\
@@ -29,10 +32,10 @@ class Controller(object):
 
     def text_to_screen(self, screen, text, x, y, shade):
         try:
-            text = str(text)
-            font = pygame.font.SysFont('arial', 40)
-            text = font.render(text, True, shade)
-            screen.blit(text, (x, y))
+            if screen is self.game_display:
+                self.renderer.text(text, x, y, shade)
+            else:
+                screen.blit(self.renderer.glyphs.render(text, shade), (x, y))
         except:
             pass
 
@@ -40,14 +43,14 @@ class Controller(object):
     def draw_columns(self):
         for column in range(0,7):
             if column % 2 == 0:
-                pygame.draw.rect(self.game_display, self.colors['light gray'], [self.w / 7 * column, 0,
+                self.renderer.rect(self.colors['light gray'], [self.w / 7 * column, 0,
                                 self.radius * 2 + self.w / 7 * column, self.h])
             else:
-                pygame.draw.rect(self.game_display, self.colors['white'], [self.w / 7 * column, 0,
+                self.renderer.rect(self.colors['white'], [self.w / 7 * column, 0,
                                 self.radius * 2 + self.w / 7 * column, self.h])
             self.text_to_screen(self.game_display, column + 1, self.radius * .8 + self.w / 7 * column,
                         35, self.colors['black']) 
-        pygame.display.update()
+        self.renderer.update()
     
     def draw_tokens(self):
         for y in range(self.game_board.shape(0)):
@@ -55,7 +58,7 @@ class Controller(object):
                 # not an empty slot
                 if not self.game_board[x][y] == -1:
                     token_color = self.colors['yellow'] if self.game_board[x][y] == 0 else self.colors['red']
-                    pygame.draw.circle(self.game_display, token_color,\
+                    self.renderer.circle(token_color,\
                         [int(x*(self.radius*2) + self.radius),\
                         int(y * self.h/6 + self.radius)], self.radius)
     
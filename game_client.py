@@ -0,0 +1,117 @@
+'''
+Client for game_server.py
+
+    python game_client.py <model>                      play a game from the terminal
+    python game_client.py <model> --load 200 --games 5 200 concurrent random players
+
+Load tests report the moves answered per second and the latencies seen by
+the clients, followed by the server's own stats.
+'''
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from game_server import default_port
+
+
+async def connect(args):
+    if args.unix is not None:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def command(reader, writer, line):
+    '''
+    Send a line, returns the lines of the answer
+    '''
+    writer.write((line + '\n').encode())
+    await writer.drain()
+    lines = []
+    while True:
+        answer = (await reader.readline()).decode().strip()
+        if not answer:
+            raise ConnectionError('Server closed the connection')
+        lines.append(answer)
+        if answer.startswith(('BOARD', 'ERROR', 'STATS')):
+            return lines
+
+
+def parse_board(line):
+    '''
+    returns the number of rows and columns and the cells of a BOARD line
+    '''
+    _, shape, cells = line.split()
+    num_rows, num_cols = map(int, shape.split('x'))
+    return num_rows, num_cols, cells
+
+
+def print_board(line):
+    num_rows, num_cols, cells = parse_board(line)
+    for row in range(num_rows):
+        print(' '.join(cells[row * num_cols:(row + 1) * num_cols]))
+    print(' '.join(str(col % 10) for col in range(1, num_cols + 1)))
+
+
+async def play_terminal(args):
+    reader, writer = await connect(args)
+    lines = await command(reader, writer, f'NEW {args.model} {"second" if args.second else "first"}')
+    while True:
+        for line in lines:
+            if line.startswith('BOARD'):
+                print_board(line)
+            elif line.startswith(('END', 'ERROR', 'NETWORK')):
+                print(line)
+        if any(line.startswith('END') for line in lines) or lines[-1].startswith('ERROR No'):
+            break
+        column = await asyncio.get_running_loop().run_in_executor(None, input, 'Column: ')
+        lines = await command(reader, writer, f'MOVE {column}')
+    writer.close()
+
+
+async def random_player(args, rng, latencies):
+    '''
+    Play games with random legal moves, timing every answered move
+    '''
+    reader, writer = await connect(args)
+    for _ in range(args.games):
+        lines = await command(reader, writer, f'NEW {args.model} {rng.choice(["first", "second"])}')
+        while not any(line.startswith('END') for line in lines):
+            num_rows, num_cols, board = parse_board(lines[-1])
+            # The top row shows which columns are not full
+            column = rng.choice([col for col in range(num_cols) if board[col] == '_'])
+            start = time.perf_counter()
+            lines = await command(reader, writer, f'MOVE {column + 1}')
+            latencies.append(time.perf_counter() - start)
+    lines = await command(reader, writer, 'STATS')
+    writer.close()
+    return lines[-1]
+
+
+async def load_test(args):
+    latencies = []
+    start = time.perf_counter()
+    stats = await asyncio.gather(*[random_player(args, random.Random(seed), latencies) for seed in range(args.load)])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e3
+    print(f'{args.load} sessions, {args.load * args.games} games, {len(latencies)} moves in {elapsed:.2f}s '
+          f'({len(latencies) / elapsed:,.0f} moves/sec)')
+    print(f'client latency: mean {latencies.mean():.2f} ms, p50 {np.percentile(latencies, 50):.2f} ms, '
+          f'p99 {np.percentile(latencies, 99):.2f} ms')
+    print('server: ' + json.dumps(json.loads(stats[-1].split(' ', 1)[1])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', help='Model name in the server\'s model directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--unix', help='Connect to this Unix socket instead of TCP')
+    parser.add_argument('--second', action='store_true', help='Let the network move first')
+    parser.add_argument('--load', type=int, default=0, help='Concurrent random players to load test with')
+    parser.add_argument('--games', type=int, default=5, help='Games each random player plays')
+    args = parser.parse_args()
+    asyncio.run(load_test(args) if args.load else play_terminal(args))
@@ -0,0 +1,269 @@
+'''
+Append-only store of played games
+
+A record file is a 16 byte header followed by fixed size records, so record
+i always starts at header_size + i * record_size and the file can be
+memory mapped and indexed without reading it:
+
+    magic (4 bytes) | format version (uint32) | record size (uint32) | board (uint32)
+
+The board holds the number of rows in its low 16 bits, of columns in the
+next 8 and the stones in a line needed to win in the high 8 (0 for 4). It
+sizes the records: each one holds the generation, both
+player ids, the winner (-1 for no winner), the number of moves and room for
+every move of a game on that board, two columns to a byte on boards up to 16
+columns wide and one to a byte on wider ones. A trailing partial record, from
+a crash mid-write, is ignored.
+
+Version 1 files left the board at 0, they are all 6x7.
+'''
+import os
+import struct
+
+import numpy as np
+
+from connect_4 import default_connect, default_game_board_size, max_moves
+
+magic = b'C4GR'
+format_version = 2
+_header = struct.Struct('<4sIII')
+
+
+def packs_nibbles(game_board_size):
+    '''
+    Whether every column of the board fits in half a byte
+    '''
+    return game_board_size[1] <= 16
+
+
+def record_dtype(game_board_size=default_game_board_size):
+    '''
+    Record of one game on a (num_rows, num_cols) board
+    '''
+    num_rows, num_cols = game_board_size
+    if num_cols > 255:
+        raise ValueError(f'Records hold boards up to 255 columns wide, not {num_cols}')
+    moves = max_moves(game_board_size)
+    return np.dtype([('generation', '<u4'),
+                     ('players', '<u4', 2),
+                     ('winner', 'i1'),
+                     ('num_moves', 'u1' if moves < 256 else '<u4'),
+                     ('moves', 'u1', (moves + 1) // 2 if packs_nibbles(game_board_size) else moves)])
+
+
+def _pack_board(game_board_size, connect):
+    num_rows, num_cols = game_board_size
+    return num_rows | num_cols << 16 | connect << 24
+
+
+def _unpack_board(board):
+    if not board:
+        return default_game_board_size, default_connect
+    return (board & 0xFFFF, board >> 16 & 0xFF), board >> 24 or default_connect
+
+
+def pack_moves(moves, nibbles=True):
+    '''
+    (N, max_moves) columns, -1 after the last move, into (N, max_moves / 2)
+    bytes, or (N, max_moves) bytes without nibbles
+    '''
+    if not nibbles:
+        return np.asarray(moves).astype(np.uint8)
+    moves = np.asarray(moves).astype(np.uint8) & 0xF
+    if moves.shape[1] % 2:
+        moves = np.pad(moves, ((0, 0), (0, 1)), constant_values=0xF)
+    return moves[:, 0::2] | (moves[:, 1::2] << 4)
+
+
+def unpack_moves(packed, num_moves, game_board_size=default_game_board_size):
+    '''
+    Inverse of pack_moves, (N, max_moves) columns with -1 after the last move
+    '''
+    packed = np.asarray(packed, dtype=np.uint8)
+    length = max_moves(game_board_size)
+    if packs_nibbles(game_board_size):
+        moves = np.empty((len(packed), packed.shape[1] * 2), dtype=np.int16)
+        moves[:, 0::2] = packed & 0xF
+        moves[:, 1::2] = packed >> 4
+        moves = moves[:, :length]
+    else:
+        moves = packed.astype(np.int16)
+    moves[np.arange(length) >= np.asarray(num_moves).reshape(-1, 1)] = -1
+    return moves
+
+
+def read_board(location):
+    '''
+    (num_rows, num_cols) and connect of the games in a record file
+    '''
+    with open(location, 'rb') as file:
+        header = file.read(_header.size)
+    if len(header) < _header.size:
+        raise ValueError(f'{location} is not a game record file')
+    file_magic, version, record_size, board = _header.unpack(header)
+    if file_magic != magic:
+        raise ValueError(f'{location} is not a game record file')
+    game_board_size, connect = _unpack_board(board)
+    if version > format_version or record_size != record_dtype(game_board_size).itemsize:
+        raise ValueError(f'{location} has record format {version}, only {format_version} is supported')
+    return game_board_size, connect
+
+
+class Game_Record_Writer(object):
+    '''
+    Buffers games in memory and appends them to a record file in blocks
+    '''
+
+    def __init__(self, location, buffer_size=65536, game_board_size=default_game_board_size,
+                 connect=default_connect):
+        '''
+            Constructor for Game_Record_Writer
+            location: Record file to append to, created if it does not exist
+            buffer_size: Games kept in memory before they are written
+            game_board_size, connect: Board and rules of the games, an existing file must hold the same ones
+        '''
+        self.location = location
+        self.game_board_size = tuple(game_board_size)
+        self.connect = connect
+        if not 0 < connect < 256:
+            raise ValueError(f'Records hold lines of 1 to 255 stones, not {connect}')
+        self.dtype = record_dtype(self.game_board_size)
+        directory = os.path.dirname(location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(location) and os.path.getsize(location):
+            board, file_connect = read_board(location)
+            if board != self.game_board_size or file_connect != connect:
+                raise ValueError(f'{location} holds connect {file_connect} games on a {board[0]}x{board[1]} board, '
+                                 f'not connect {connect} on {self.game_board_size[0]}x{self.game_board_size[1]}')
+        self.file = open(location, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(_header.pack(magic, format_version, self.dtype.itemsize,
+                                         _pack_board(self.game_board_size, connect)))
+        else:
+            # Never append after a torn record, or every later one would be misaligned
+            size = self.file.tell()
+            self.file.truncate(size - (size - _header.size) % self.dtype.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        self.buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self.num_buffered = 0
+        self.num_written = 0
+        self.generation = 0
+
+    def start_generation(self, generation):
+        '''
+        Generation stored with the games added from now on
+        '''
+        self.generation = generation
+
+    def add(self, pairings, winners, moves, num_moves):
+        '''
+        Store a batch of games
+            pairings: (N, 2) player ids, the first one moves first
+            winners: Winner of each game, 0 or 1, -1 for none
+            moves: (N, max_moves) columns played, -1 after the last one
+        '''
+        pairings = np.asarray(pairings).reshape(-1, 2)
+        packed = pack_moves(moves, packs_nibbles(self.game_board_size))
+        start = 0
+        while start < len(pairings):
+            count = min(len(pairings) - start, len(self.buffer) - self.num_buffered)
+            block = self.buffer[self.num_buffered:self.num_buffered + count]
+            block['generation'] = self.generation
+            block['players'] = pairings[start:start + count]
+            block['winner'] = winners[start:start + count]
+            block['num_moves'] = num_moves[start:start + count]
+            block['moves'] = packed[start:start + count]
+            self.num_buffered += count
+            start += count
+            if self.num_buffered == len(self.buffer):
+                self.flush()
+
+    def truncate(self, generation):
+        '''
+        Drop the games of generation and every later one, as after resuming
+        from a checkpoint taken before them. Games are stored in generation order.
+        '''
+        self.flush()
+        num_records = (self.file.tell() - _header.size) // self.dtype.itemsize
+        if num_records:
+            records = np.memmap(self.location, dtype=self.dtype, mode='r', offset=_header.size,
+                                shape=(num_records,))
+            num_records = int(np.searchsorted(records['generation'], generation))
+            del records
+        self.file.truncate(_header.size + num_records * self.dtype.itemsize)
+        self.file.seek(0, os.SEEK_END)
+
+    def flush(self):
+        if self.num_buffered:
+            self.file.write(self.buffer[:self.num_buffered].tobytes())
+            self.num_written += self.num_buffered
+            self.num_buffered = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Game_Records(object):
+    '''
+    Memory mapped reader of a record file, records are only read when used
+    '''
+
+    def __init__(self, location):
+        self.game_board_size, self.connect = read_board(location)
+        dtype = record_dtype(self.game_board_size)
+        num_records = (os.path.getsize(location) - _header.size) // dtype.itemsize
+        if num_records:
+            self.records = np.memmap(location, dtype=dtype, mode='r', offset=_header.size,
+                                     shape=(num_records,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        '''
+        (generation, players, winner, moves) of game idx, moves as a list of columns
+        '''
+        record = self.records[idx]
+        moves = unpack_moves(record['moves'][None], record['num_moves'], self.game_board_size)[0]
+        return (int(record['generation']), tuple(int(player) for player in record['players']),
+                int(record['winner']), moves[:record['num_moves']].tolist())
+
+    def chunks(self, chunk_size=1 << 20):
+        '''
+        Stream the records as (records, moves) blocks of up to chunk_size games,
+        moves unpacked to (N, max_moves) columns
+        '''
+        for start in range(0, len(self.records), chunk_size):
+            records = self.records[start:start + chunk_size]
+            yield records, unpack_moves(records['moves'], records['num_moves'], self.game_board_size)
+
+    def num_moves(self):
+        '''
+        Total moves of every stored game
+        '''
+        return sum(int(self.records['num_moves'][start:start + (1 << 20)].sum(dtype=np.int64))
+                   for start in range(0, len(self.records), 1 << 20))
+
+
+def replay(moves):
+    '''
+    Connect_4 callbacks that play the given moves in order, and an invalid
+    move once they run out, as a recorded game that ended on one did
+    '''
+    def player(start):
+        turns = iter(moves[start::2])
+        return lambda board: next(turns, -1)
+    return [player(0), player(1)]
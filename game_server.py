@@ -0,0 +1,273 @@
+'''
+Serve games against trained networks to many players at once
+
+Models are loaded from log/ through a Model_Registry, which keeps them, and
+both loading them and their moves are done on a thread pool so the event
+loop keeps serving other sessions. Every connection is one session playing
+one game at a time, on the board the model was trained on.
+
+The protocol is one line per message. The client sends
+
+    NEW <model> [first|second]    start a game, moving first by default
+    MOVE <column>                 play a column, from 1
+    STATS                         latency and session counts
+    QUIT
+
+and the server answers with
+
+    NETWORK <column>              the column the network played
+    END <you|network|draw|forfeit>
+    BOARD <rows>x<cols> <cells>   the board row by row from the top, _ X O
+    ERROR <message>
+    STATS <json>
+
+where every answer ends with one BOARD, ERROR or STATS line, and END comes
+before the last board of a game.
+
+Start it with `python game_server.py [--port 5556 | --unix path]`, and play
+or load test it with game_client.py
+'''
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from connect_4 import _Interface, default_connect, default_game_board_size, engines
+from model_registry import Model_Registry
+from quantize import inference_network
+
+default_port = 5556
+symbols = {-1: '_', 0: 'X', 1: 'O'}
+
+
+class Session(object):
+    '''
+    One game between a client and a network, played a move at a time with
+    the same rules as Connect_4.run_game
+    '''
+
+    def __init__(self, network, human_first=True, game_board_size=default_game_board_size, connect=default_connect):
+        self.network = network
+        self.human = 0 if human_first else 1
+        self.gamestate = engines['bitboard'](_Interface([None, None], printing=False), game_board_size=game_board_size,
+                                             connect=connect, printing=False)
+        self.result = None
+
+    def board_line(self):
+        gamestate = self.gamestate
+        return (f'BOARD {gamestate.num_rows}x{gamestate.num_cols} '
+                + ''.join(symbols[int(value)] for value in gamestate.game_board.reshape(-1)))
+
+    def play(self, player, column):
+        '''
+        Play a move, returns False when it is invalid
+        '''
+        self.gamestate.current_player = player
+        if not self.gamestate.play_turn(column):
+            return False
+        self.gamestate.game_moves.append(column)
+        if self.gamestate.winner != -1:
+            self.result = 'you' if self.gamestate.winner == self.human else 'network'
+        elif len(self.gamestate.game_moves) == self.gamestate.max_moves:
+            # Cat's game
+            self.result = 'draw'
+        return True
+
+
+class Game_Server(object):
+    '''
+    Asyncio server running a Session per connection
+    '''
+
+    def __init__(self, model_dir='log', inference='float64', num_threads=4):
+        '''
+            Constructor for Game_Server
+            model_dir: Where the models are loaded from
+            inference: One of quantize.modes for the networks' moves
+            num_threads: Threads the networks' moves are computed on
+        '''
+        self.registry = Model_Registry(model_dir)
+        self.inference = inference
+        # Converted networks by content hash, so renamed or copied models share one
+        self.networks = OrderedDict()
+        self.max_networks = 64
+        # The registry and the cache are not thread safe
+        self.load_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(num_threads)
+        self.sessions = 0
+        self.peak_sessions = 0
+        self.total_sessions = 0
+        self.games = 0
+        # Seconds from receiving a move to answering it, for the last max_latencies moves
+        self.latencies = []
+        self.max_latencies = 100000
+        self.started = time.perf_counter()
+
+    def load(self, name):
+        '''
+        The model named name converted for inference, from disk only when
+        neither the registry nor the cache of converted models has it
+        returns the network, and the game_board_size and connect it plays with
+        '''
+        with self.load_lock:
+            if name not in self.registry:
+                self.registry.refresh()
+            entry = self.registry.entries.get(name)
+            if entry is None:
+                raise KeyError(f'No model named {name} in {self.registry.directory}')
+            key = entry['hash']
+            model = self.networks.get(key)
+            if model is not None:
+                self.networks.move_to_end(key)
+                return model
+            model = self.networks[key] = (inference_network(self.registry.load(name), self.inference),
+                                          *self.registry.board(name))
+            while len(self.networks) > self.max_networks:
+                self.networks.popitem(last=False)
+            return model
+
+    async def load_async(self, name):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.load, name)
+
+    async def network_move(self, session):
+        board = session.gamestate.game_board.copy()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, session.network, board)
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        self.total_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.sessions)
+        session = None
+
+        def send(*lines):
+            writer.write(''.join(line + '\n' for line in lines).encode())
+
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                command, *args = line.decode().split() or ['']
+                command = command.upper()
+
+                try:
+                    if command == 'QUIT':
+                        break
+                    elif command == 'STATS':
+                        send('STATS ' + json.dumps(self.stats()))
+                    elif command == 'NEW':
+                        if not args:
+                            send('ERROR NEW needs a model name')
+                            continue
+                        try:
+                            network, game_board_size, connect = await self.load_async(args[0])
+                        except (KeyError, OSError, ValueError) as error:
+                            send(f'ERROR {error}')
+                            continue
+                        session = Session(network, args[1:2] != ['second'], game_board_size, connect)
+                        self.games += 1
+                        if session.human == 1:
+                            await self.reply(session, send)
+                        else:
+                            send(session.board_line())
+                    elif command == 'MOVE':
+                        if session is None or session.result is not None:
+                            send('ERROR No game in progress, start one with NEW')
+                            continue
+                        try:
+                            column = int(args[0]) - 1
+                        except (IndexError, ValueError):
+                            send(f'ERROR MOVE needs a column from 1 to {session.gamestate.num_cols}')
+                            continue
+                        if not session.play(session.human, column):
+                            send('ERROR Invalid move')
+                            continue
+                        if session.result is not None:
+                            send(f'END {session.result}', session.board_line())
+                            continue
+                        await self.reply(session, send)
+                        self.latencies.append(time.perf_counter() - start)
+                        if len(self.latencies) > self.max_latencies:
+                            del self.latencies[:len(self.latencies) - self.max_latencies]
+                    else:
+                        send(f'ERROR Unknown command {command}')
+                except ConnectionError:
+                    raise
+                except Exception as error:
+                    # A broken model or move ends the game, not the connection
+                    session = None
+                    send(f'ERROR {type(error).__name__}: {error}')
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def reply(self, session, send):
+        '''
+        Play the network's move and send it with the board
+        '''
+        column = await self.network_move(session)
+        if not session.play(1 - session.human, column):
+            # The network played a full column
+            session.result = 'forfeit'
+            send('END forfeit', session.board_line())
+            return
+        send(f'NETWORK {column + 1}')
+        if session.result is not None:
+            send(f'END {session.result}')
+        send(session.board_line())
+
+    def stats(self):
+        '''
+        Move latencies in milliseconds and session counts
+        '''
+        latencies = np.array(self.latencies) * 1e3
+        stats = {'sessions': self.sessions, 'peak_sessions': self.peak_sessions,
+                 'total_sessions': self.total_sessions, 'games': self.games, 'moves': len(latencies),
+                 'uptime': time.perf_counter() - self.started}
+        if len(latencies):
+            stats.update({'latency_mean_ms': float(latencies.mean()),
+                          'latency_p50_ms': float(np.percentile(latencies, 50)),
+                          'latency_p99_ms': float(np.percentile(latencies, 99))})
+        return stats
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            print(json.dumps(self.stats()), flush=True)
+
+    async def serve(self, host='127.0.0.1', port=default_port, unix=None, report_every=10):
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        if report_every:
+            asyncio.get_running_loop().create_task(self.report(report_every))
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--unix', help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--model-dir', default='log')
+    parser.add_argument('--inference', default='float64', help='One of quantize.modes, float64 plays exactly as trained')
+    parser.add_argument('--threads', type=int, default=4, help='Threads for network moves')
+    parser.add_argument('--report-every', type=float, default=10, help='Seconds between stats lines, 0 for none')
+    args = parser.parse_args()
+
+    server = Game_Server(args.model_dir, args.inference, args.threads)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_every))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,205 @@
+'''
+Archive of the best networks of every generation
+
+A hall of fame file is a header in the same form as a model file (see
+checkpoint.py) followed by fixed size records, top_k for every archived
+generation in rank order:
+
+    magic (4 bytes) | format version (uint32) | json length (uint32) | json | padding
+    generation (uint32) | rank (uint32) | score (float64) | genome (float32 * genome_length) | padding
+
+The json has the layout of the genomes, top_k, the first generation and the
+number of generations between archived ones (every), so the record of any
+generation and rank is at a known offset and the file can be memory mapped.
+Records are padded to a multiple of 64 bytes, and the file grows by exactly
+top_k records per archived generation.
+'''
+import os
+
+import numpy as np
+
+from checkpoint import alignment, pack_header, read_header
+from network import Network, Population
+
+magic = b'C4HF'
+format_version = 1
+
+
+def record_dtype(genome_length):
+    '''
+    Record of one archived network, padded to a multiple of alignment bytes
+    '''
+    size = 16 + 4 * genome_length
+    return np.dtype({'names': ['generation', 'rank', 'score', 'genome'],
+                     'formats': ['<u4', '<u4', '<f8', ('<f4', (genome_length,))],
+                     'offsets': [0, 4, 8, 16],
+                     'itemsize': size + (-size % alignment)})
+
+
+def _read_header(location):
+    '''
+    returns the json header and the offset of the first record
+    '''
+    return read_header(location, magic, format_version, 'hall of fame')
+
+
+class Hall_Of_Fame_Writer(object):
+    '''
+    Appends the best networks of every every-th generation to a hall of fame file
+    '''
+
+    def __init__(self, location, layout, top_k, every=1, metadata=None):
+        '''
+            Constructor for Hall_Of_Fame_Writer
+            location: Hall of fame file to append to, created if it does not exist
+            layout: Shape of each weight and bias array of a genome
+            top_k: Networks archived per generation
+            every: Generations between archived ones
+            metadata: Stored in the header of a new file
+        '''
+        directory = os.path.dirname(location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.layout = [list(shape) for shape in layout]
+        self.top_k = top_k
+        self.every = every
+        self.dtype = record_dtype(sum(int(np.prod(shape)) for shape in layout))
+        self.file = open(location, 'a+b')
+        self.first_generation = None
+        self.metadata = metadata or {}
+        if self.file.tell():
+            header, self.offset = _read_header(location)
+            if header['layout'] != self.layout or header['top_k'] != top_k or header['every'] != every:
+                raise ValueError(f'{location} archives top {header["top_k"]} every {header["every"]} generations '
+                                 f'of networks with layout {header["layout"]}')
+            self.first_generation = header['first_generation']
+
+    def _start(self, generation):
+        header = pack_header({'layout': self.layout, 'top_k': self.top_k, 'every': self.every,
+                              'first_generation': generation, 'metadata': self.metadata}, magic, format_version)
+        self.file.write(header)
+        self.offset = len(header)
+        self.first_generation = generation
+
+    def add(self, generation, best):
+        '''
+        Archive the best networks of a generation, generations between every-th
+        ones are skipped. Archiving a generation again, as after resuming from
+        an earlier checkpoint, drops it and every later one first.
+            best: (network, score) of each of the top_k networks, best first
+        '''
+        if len(best) != self.top_k:
+            raise ValueError(f'Expected the best {self.top_k} networks, got {len(best)}')
+        if self.first_generation is None:
+            self._start(generation)
+        if (generation - self.first_generation) % self.every:
+            return
+        slot = (generation - self.first_generation) // self.every
+        if slot < 0:
+            raise ValueError(f'Generation {generation} is before the first archived one, {self.first_generation}')
+        self.file.seek(0, os.SEEK_END)
+        stored = (self.file.tell() - self.offset) // (self.dtype.itemsize * self.top_k)
+        if slot > stored:
+            raise ValueError(f'Generation {generation} would leave a gap after the last archived one, '
+                             f'{self.first_generation + (stored - 1) * self.every}')
+        # Also drops a torn generation from a crash mid-write
+        self.file.truncate(self.offset + slot * self.top_k * self.dtype.itemsize)
+
+        records = np.zeros(self.top_k, dtype=self.dtype)
+        records['generation'] = generation
+        records['rank'] = np.arange(self.top_k)
+        for record, (network, score) in zip(records, best):
+            record['score'] = score
+            record['genome'] = network.genome()
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Hall_Of_Fame(object):
+    '''
+    Memory mapped reader of a hall of fame file, genomes are only read when used
+    '''
+
+    def __init__(self, location):
+        header, offset = _read_header(location)
+        self.layout = [tuple(shape) for shape in header['layout']]
+        self.layer_sizes = [(shape[1], shape[0]) for shape in self.layout[::2]]
+        self.top_k = header['top_k']
+        self.every = header['every']
+        self.first_generation = header['first_generation']
+        self.metadata = header['metadata']
+        dtype = record_dtype(sum(int(np.prod(shape)) for shape in self.layout))
+        # Only whole generations, a torn one is ignored
+        num_generations = (os.path.getsize(location) - offset) // (dtype.itemsize * self.top_k)
+        if num_generations:
+            self.records = np.memmap(location, dtype=dtype, mode='r', offset=offset,
+                                     shape=(num_generations, self.top_k))
+        else:
+            self.records = np.zeros((0, self.top_k), dtype=dtype)
+
+    def __len__(self):
+        '''
+        Number of archived generations
+        '''
+        return len(self.records)
+
+    def generations(self):
+        return range(self.first_generation, self.first_generation + len(self) * self.every, self.every)
+
+    def _slot(self, generation):
+        slot, remainder = divmod(generation - self.first_generation, self.every)
+        if remainder or not 0 <= slot < len(self):
+            raise KeyError(f'Generation {generation} is not archived')
+        return slot
+
+    def _slots(self, start, stop):
+        '''
+        Slice of the archived generations from start up to stop, any generations by default
+        '''
+        start = 0 if start is None else -(-(start - self.first_generation) // self.every)
+        stop = len(self) if stop is None else -(-(stop - self.first_generation) // self.every)
+        return slice(max(start, 0), max(stop, 0))
+
+    def score(self, generation, rank=0):
+        return float(self.records['score'][self._slot(generation), rank])
+
+    def network(self, generation, rank=0):
+        '''
+        Read-only network viewing the archived weights of a generation's rank-th best
+        '''
+        return Network(self.records['genome'][self._slot(generation), rank], self.layer_sizes)
+
+    def genomes(self, start=None, stop=None, ranks=None):
+        '''
+        (generations, ranks, genome_length) view of the genomes of the generations from start up to stop
+            ranks: Ranks to keep, every rank when None
+        '''
+        genomes = self.records['genome'][self._slots(start, stop)]
+        return genomes if ranks is None else genomes[:, ranks]
+
+    def scores(self, start=None, stop=None):
+        '''
+        (generations, top_k) scores of the generations from start up to stop
+        '''
+        return np.array(self.records['score'][self._slots(start, stop)])
+
+    def population(self, start=None, stop=None, ranks=None):
+        '''
+        Population of the archived networks of the generations from start up
+        to stop, generation by generation in rank order, for playing against
+        them in a Batch_Connect_4
+        '''
+        genomes = self.genomes(start, stop, ranks)
+        return Population.from_genomes(genomes.reshape(-1, genomes.shape[-1]), self.layer_sizes)
@@ -0,0 +1,220 @@
+'''
+Island model evolution
+
+num_islands populations evolve in their own processes, each with trainer's
+settings and its own tournament. Every migrate_every generations each
+island sends copies of its num_migrants best networks to its neighbours,
+which take them in place of some of their new random networks. Islands
+never wait for each other: migrants are taken in whenever they have arrived.
+
+Every generation of every island is appended to island_log_path, and each
+island's best is played against the search ladder every ladder_every
+generations, a score that can be compared between islands and against a
+single population (num_islands = 1).
+
+Run with `python islands.py`
+'''
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from itertools import chain, zip_longest
+
+import numpy as np
+
+import trainer
+from match_cache import Match_Cache
+from network import Network
+from position_cache import Position_Cache
+from telemetry import Telemetry
+
+num_islands = os.cpu_count()
+total_generations = 1000
+migrate_every = 10
+num_migrants = 2
+# 'ring' sends to the next island, 'full' to every other island
+topology = 'ring'
+ladder_every = 10
+island_log_path = 'telemetry/islands.jsonl'
+seed = 0
+
+
+def neighbours(island, num_islands, topology):
+    '''
+    The islands an island sends its migrants to
+    '''
+    if num_islands == 1:
+        return []
+    if topology == 'ring':
+        return [(island + 1) % num_islands]
+    if topology == 'full':
+        return [other for other in range(num_islands) if other != island]
+    raise ValueError(f'Unknown topology {topology}, expected ring or full')
+
+
+def immigrant_slots(population_size):
+    '''
+    Indexes of the networks trainer.run_generation has just randomized, which
+    immigrants replace so no copy of a survivor is lost: each survivor's block
+    of pop_size // num_surviving copies is followed by 10 new networks, and
+    the slots go through the blocks in turn, from the end of each
+    '''
+    num_copies = trainer.pop_size // trainer.num_surviving
+    block = num_copies + 10
+    blocks = [range(start + block - 1, start + num_copies - 1, -1) for start in range(0, population_size, block)]
+    return [slot for slot in chain.from_iterable(zip_longest(*blocks)) if slot is not None]
+
+
+def _take_migrants(inbox, population):
+    '''
+    Copy every migrant that has arrived over the new random networks of the
+    population, newest migrants first and never more than there are new networks
+    '''
+    migrants = []
+    while True:
+        try:
+            migrants.extend(inbox.get_nowait()[1])
+        except queue.Empty:
+            break
+    slots = immigrant_slots(len(population))
+    migrants = migrants[::-1][:len(slots)]
+    for slot, genome in zip(slots, migrants):
+        np.copyto(population[slot].genome(), genome)
+    return len(migrants)
+
+
+def _island(island, inboxes, results, generations, settings):
+    '''
+    Evolve one island, sending a record of every generation to results, or
+    the traceback of whatever stopped it
+    '''
+    try:
+        _evolve(island, inboxes, results, generations, settings)
+    except BaseException:
+        results.put(('error', {'island': island, 'traceback': traceback.format_exc()}))
+        raise
+
+
+def _evolve(island, inboxes, results, generations, settings):
+    # Whatever is left unread when an island finishes can be dropped
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+    # Islands play their tournaments in their own process
+    if trainer.simulator in ('processes', 'distributed'):
+        trainer.simulator = 'batched'
+    island_seed = settings['seed'] * 1000 + island
+    mutator, rng = trainer.seed_run(island_seed)
+    arena, population = trainer.new_population()
+    telemetry = Telemetry()
+    cache = Match_Cache(trainer.match_cache_size) if trainer.match_cache_size else None
+    positions = Position_Cache(trainer.position_cache_size) \
+        if trainer.position_cache_size and trainer.simulator == 'serial' else None
+    start = time.perf_counter()
+
+    for generation in range(generations):
+        telemetry.start_generation(generation)
+        population, best = trainer.run_generation(arena, population, mutator, telemetry=telemetry, cache=cache,
+                                                   positions=positions, rng=rng)
+
+        immigrants = 0
+        if settings['migrate_every'] and (generation + 1) % settings['migrate_every'] == 0:
+            with telemetry.stage('migrate'):
+                migrants = np.stack([network.genome() for network, score in best[:settings['num_migrants']]])
+                for neighbour in neighbours(island, len(inboxes), settings['topology']):
+                    inboxes[neighbour].put((island, migrants))
+                immigrants = _take_migrants(inboxes[island], population)
+
+        counts = positions.take_counts() if positions is not None else {}
+        record = telemetry.end_generation(generation, island=island, best_score=best[0][1], immigrants=immigrants,
+                                          elapsed=time.perf_counter() - start, **counts)
+        if settings['ladder_every'] and (generation + 1) % settings['ladder_every'] == 0:
+            record['ladder_score'] = int(trainer.ladder_scores([best[0][0]])[0])
+        results.put(('generation', record))
+
+    best_network, best_score = best[0]
+    results.put(('done', {'island': island, 'genome': np.array(best_network.genome()),
+                          'layout': best_network.layout(), 'score': best_score,
+                          'ladder_score': int(trainer.ladder_scores([best_network])[0])}))
+
+
+def run_islands(num_islands=num_islands, generations=total_generations, migrate_every=migrate_every,
+                num_migrants=num_migrants, topology=topology, ladder_every=ladder_every, log_path=island_log_path,
+                seed=seed):
+    '''
+    Evolve the islands to the end, stopping every island if one of them fails
+    returns the final record of each island and the best network of each
+    '''
+    settings = {'migrate_every': migrate_every, 'num_migrants': num_migrants, 'topology': topology,
+                'ladder_every': ladder_every, 'seed': seed}
+    neighbours(0, num_islands, topology)
+    inboxes = [multiprocessing.Queue() for _ in range(num_islands)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_island, args=(island, inboxes, results, generations, settings),
+                                         daemon=True)
+                 for island in range(num_islands)]
+    for process in processes:
+        process.start()
+
+    log = None
+    if log_path is not None:
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        log = open(log_path, 'a', buffering=1)
+    last_records = [None] * num_islands
+    finished = [None] * num_islands
+    try:
+        while not all(finished):
+            # An island killed from outside, such as by the OOM killer, never says so
+            for island, process in enumerate(processes):
+                if finished[island] is None and process.exitcode not in (None, 0):
+                    raise RuntimeError(f'Island {island} exited with code {process.exitcode}')
+            try:
+                kind, message = results.get(timeout=1)
+            except queue.Empty:
+                continue
+            if kind == 'error':
+                raise RuntimeError(f'Island {message["island"]} failed:\n{message["traceback"]}')
+            if kind == 'generation':
+                last_records[message['island']] = message
+                if log is not None:
+                    log.write(json.dumps(message) + '\n')
+                if 'ladder_score' in message:
+                    print(f'island {message["island"]:>3} generation {message["generation"] + 1:>5}: '
+                          f'ladder {message["ladder_score"]:>4} after {message["elapsed"]:,.1f}s', flush=True)
+            else:
+                finished[message['island']] = message
+    finally:
+        if log is not None:
+            log.close()
+        for process in processes:
+            if process.is_alive() and not all(finished):
+                process.terminate()
+    for process in processes:
+        process.join()
+    best = [(Network.from_genome(message['genome'], message['layout']), message) for message in finished]
+    return last_records, best
+
+
+def report(records, best):
+    lines = [f'{"island":>6} {"generations":>11} {"seconds":>9} {"gen/sec":>8} {"games/sec":>10} '
+             f'{"best":>6} {"ladder":>6}']
+    for record, (network, final) in zip(records, best):
+        lines.append(f'{record["island"]:>6} {record["generation"] + 1:>11} {record["elapsed"]:>9.1f} '
+                     f'{(record["generation"] + 1) / record["elapsed"]:>8.2f} {record["games_per_second"]:>10,.0f} '
+                     f'{final["score"]:>6} {final["ladder_score"]:>6}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    records, best = run_islands()
+    print(report(records, best))
+
+    # Save the best of every island
+    if not os.path.exists("log"):
+        os.mkdir("log")
+    for network, final in best:
+        network.save(f'log/island_{final["island"]}_ladder_{final["ladder_score"]}', score=final['score'],
+                     ladder_score=final['ladder_score'], generation=records[final['island']]['generation'] + 1)
@@ -10,6 +10,8 @@ NOTE:
 import pygame
 import re
 
+from render import Renderer
+
 # prepare pygame
 pygame.init()
 pygame.font.init()
@@ -17,6 +19,9 @@ pygame.font.init()
 # window size
 gameDisplay = pygame.display.set_mode((1000, 600))
 
+# draws onto the window, only updating what changed
+renderer = Renderer(gameDisplay)
+
 # name on top left of window
 pygame.display.set_caption('Connect 4')
 
@@ -57,6 +62,10 @@ RED = (255, 0, 0)
 YELLOW = (255, 255, 0)
 color = YELLOW
 
+# what the buttons and turn panel last showed, they are only redrawn when it changes
+button_states = {}
+drawn_turn = None
+
 # prepare the screen for drawing images
 pygame.display.update()
 
@@ -67,10 +76,7 @@ Graphics Functions
 # print given text at an x,y position on the screen
 def text_to_screen(screen, text, x, y, shade):
     try:
-        text = str(text)
-        font = pygame.font.SysFont('arial', 40)
-        text = font.render(text, True, shade)
-        screen.blit(text, (x, y))
+        renderer.text(text, x, y, shade)
 
     except:
         print('this error shouldn\'t happen')
@@ -82,16 +88,16 @@ def draw_columns():
     # redraw background columns
     while column < 7:
         if column % 2 == 0:
-            pygame.draw.rect(gameDisplay, DARK,
-                             [w / 7 * column,
-                              0,
-                              radius * 2 + w / 7 * column,
-                              h])
+            renderer.rect(DARK,
+                          [w / 7 * column,
+                           0,
+                           radius * 2 + w / 7 * column,
+                           h])
         else:
-            pygame.draw.rect(gameDisplay, LIGHT,
-                             [w / 7 * column, 0,
-                              radius * 2 + w / 7 * column,
-                              h])
+            renderer.rect(LIGHT,
+                          [w / 7 * column, 0,
+                           radius * 2 + w / 7 * column,
+                           h])
         text_to_screen(gameDisplay,
                        column + 1,
                        radius * .8 + w / 7 * column,
@@ -101,15 +107,18 @@ def draw_columns():
 
 # display the new game button with the ability to change color based on state
 def draw_new_game_button(state):
+    if button_states.get('new game') == state:
+        return
+    button_states['new game'] = state
     
     ng_button_coords = [w + radius / 2, h - 100, 5 * radius, 70]
     
     # default state unfocused
     if state == 'default':
-        pygame.draw.rect(gameDisplay, WHITE, ng_button_coords)
+        renderer.rect(WHITE, ng_button_coords)
     
     elif state == 'hover':
-        pygame.draw.rect(gameDisplay, HOVER, ng_button_coords)
+        renderer.rect(HOVER, ng_button_coords)
         
     text_to_screen(gameDisplay,
                    'New Game',
@@ -119,14 +128,18 @@ def draw_new_game_button(state):
 
 # display the undo button with the ability to change color based on state
 def draw_undo_button(state):
+    if button_states.get('undo') == state:
+        return
+    button_states['undo'] = state
+    
     u_button_coords = [w + radius / 2, h - 190, 5 * radius, 70]
     
     # default state unfocused
     if state == 'default':
-        pygame.draw.rect(gameDisplay, WHITE, u_button_coords)
+        renderer.rect(WHITE, u_button_coords)
     
     elif state == 'hover':
-        pygame.draw.rect(gameDisplay, HOVER, u_button_coords)
+        renderer.rect(HOVER, u_button_coords)
         
     text_to_screen(gameDisplay,
                    'Undo',
@@ -136,6 +149,10 @@ def draw_undo_button(state):
 
 # display which player's turn it is on the right with text and a color
 def draw_player_turn():
+    global drawn_turn
+    if drawn_turn == playerOneTurn:
+        return
+    drawn_turn = playerOneTurn
     
     if playerOneTurn:
         turn = 'Yellow Turn'
@@ -145,7 +162,7 @@ def draw_player_turn():
         turn_display_w = w + 67
     
     # display player turn bar on the right
-    pygame.draw.rect(gameDisplay, color, [w + radius / 2, 110, 5 * radius, 70])
+    renderer.rect(color, [w + radius / 2, 110, 5 * radius, 70])
     text_to_screen(gameDisplay, turn, turn_display_w,  122, LIGHT)
 
 # erase the token from the screen and undo the move on the gameBoard
@@ -176,10 +193,10 @@ def draw_undo():
     
     # reset gameboard position with the found y_index and remove token from screen
     gameBoard[y_index][move_tracker[move_pos]] = 0
-    pygame.draw.circle(gameDisplay, replace_color,
-                       [int(move_tracker[move_pos] * 100 + radius),
-                        int(y_index * h / 6 + radius)],
-                        int(radius))
+    renderer.circle(replace_color,
+                    [int(move_tracker[move_pos] * 100 + radius),
+                     int(y_index * h / 6 + radius)],
+                     int(radius))
     
     # redraw number if a circle was overlapping a number
     if y_index == 0:
@@ -195,12 +212,15 @@ def draw_undo():
 
 # draw the panel on the right with the title
 def draw_ui():
+    global drawn_turn
     
     # ui panel background
-    pygame.draw.rect(gameDisplay, LIGHT, [w, 0, total_w, h])
+    renderer.rect(LIGHT, [w, 0, total_w, h])
     text_to_screen(gameDisplay, 'Connect 4', w + 1.2 * radius, 35, WHITE)
     
     #ui panel button drawing
+    button_states.clear()
+    drawn_turn = None
     draw_new_game_button('default')
     draw_undo_button('default')
 
@@ -208,7 +228,7 @@ def draw_ui():
 def draw_surface():
     draw_columns()
     draw_ui()
-    pygame.display.update()
+    renderer.update()
 
 # draw the token on the surface if possible and update the gameBoard
 def draw_token(x_index):
@@ -225,10 +245,10 @@ def draw_token(x_index):
         y_index = y_index + 1
     
     # draw token in player's desired column
-    pygame.draw.circle(gameDisplay, color,
-                       [int(x_index * 100 + radius),
-                        int(y_index * h / 6 + radius)],
-                        int(radius))
+    renderer.circle(color,
+                    [int(x_index * 100 + radius),
+                     int(y_index * h / 6 + radius)],
+                     int(radius))
     
     # put a user piece on the gameBoard
     if playerOneTurn:
@@ -442,8 +462,8 @@ while not done:
         # display the player's turn on the right
         draw_player_turn()
                         
-    # tell the window to update with new info
-    pygame.display.update()
+    # tell the window to update the regions that changed
+    renderer.update()
     clock.tick(60)
 
 # stop the loop    
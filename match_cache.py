@@ -0,0 +1,87 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint(network):
+    '''
+    Content hash of every weight and bias of a network
+    '''
+    return hashlib.blake2b(network.genome().tobytes(), digest_size=16).digest()
+
+
+class Match_Cache(object):
+    '''
+    Bounded LRU of game results keyed by the fingerprints of both players.
+    Networks are deterministic, so two networks with the same weights always
+    play the same game, and identical pairings are only simulated once.
+    '''
+
+    def __init__(self, max_size=200000):
+        '''
+            max_size: Results kept before the least recently used are dropped
+        '''
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def play(self, networks, pairings, play):
+        '''
+        Winner and number of moves of every pairing
+            play: Called as play(pairings) with only the pairings that have to
+                be simulated, returns their winners and number of moves
+        '''
+        pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+        fingerprints = [fingerprint(network) for network in networks]
+        winners = np.empty(len(pairings), dtype=np.int64)
+        num_moves = np.empty(len(pairings), dtype=np.int64)
+
+        # Look up every pairing, keeping one of each unknown game to simulate
+        keys = [fingerprints[first] + fingerprints[second] for first, second in pairings.tolist()]
+        to_play = {}
+        repeats = []
+        for idx, key in enumerate(keys):
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                winners[idx], num_moves[idx] = result
+            elif key in to_play:
+                repeats.append(idx)
+            else:
+                to_play[key] = idx
+
+        if to_play:
+            played = list(to_play.values())
+            played_winners, played_moves = play(pairings[played])
+            winners[played], num_moves[played] = played_winners, played_moves
+            for key, idx in to_play.items():
+                self.entries[key] = (int(winners[idx]), int(num_moves[idx]))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        if repeats:
+            # Same game as one simulated above
+            sources = [to_play[keys[idx]] for idx in repeats]
+            winners[repeats], num_moves[repeats] = winners[sources], num_moves[sources]
+
+        self.misses += len(to_play)
+        self.hits += len(pairings) - len(to_play)
+        return winners, num_moves
+
+    def take_counts(self):
+        '''
+        Hits and misses since the last call, which are added to the totals
+        '''
+        counts = {'cache_hits': self.hits, 'cache_misses': self.misses,
+                  'cache_hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.,
+                  'cache_size': len(self.entries)}
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+        return counts
+
+    def report(self):
+        hits, misses = self.total_hits + self.hits, self.total_misses + self.misses
+        rate = hits / (hits + misses) if hits + misses else 0.
+        return f'Match cache: {hits:,} of {hits + misses:,} games reused ({rate:.1%}), {misses:,} simulated'
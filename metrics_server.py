@@ -0,0 +1,149 @@
+'''
+Live training metrics over HTTP
+
+Metrics_Server answers GET /metrics with Prometheus text and GET /metrics.json
+with the same values as json, from a daemon thread, so a run can be watched
+with `curl 127.0.0.1:9100/metrics` without any other service.
+
+Nothing in the training loop waits for the server: it only reads the
+counters Telemetry keeps anyway, which the trainer adds to or replaces
+whole, and each value read is consistent even mid-generation.
+'''
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telemetry import current_rss_mb, peak_rss_mb
+
+default_port = 9100
+
+# name: (type, help) of every metric, in the order they are served
+_metrics = {
+    'generation': ('gauge', 'Generation being played'),
+    'generation_seconds': ('gauge', 'Seconds since the current generation started'),
+    'generation_games': ('gauge', 'Games played so far in the current generation'),
+    'games_total': ('counter', 'Games played since the run started'),
+    'moves_total': ('counter', 'Moves played since the run started'),
+    'games_per_second': ('gauge', 'Games per second of the rate stage of the last finished generation'),
+    'best_score': ('gauge', 'Best score of the last finished generation'),
+    'median_score': ('gauge', 'Median score of the last finished generation'),
+    'stage_seconds': ('gauge', 'Wall and CPU seconds of each stage of the last finished generation'),
+    'rss_bytes': ('gauge', 'Resident set size of the trainer process'),
+    'peak_rss_bytes': ('gauge', 'Peak resident set size of the trainer process'),
+    'worker_games_total': ('counter', 'Games played by each worker'),
+    'worker_busy_seconds_total': ('counter', 'Seconds each worker has spent playing games'),
+    'worker_utilization': ('gauge', 'Fraction of the time since each worker started that it was busy'),
+}
+
+
+class Metrics_Server(object):
+    '''
+    Serves the metrics of a Telemetry, and of an evaluator's workers, from a daemon thread
+    '''
+
+    def __init__(self, telemetry, evaluator=None, host='127.0.0.1', port=default_port, prefix='connect4'):
+        '''
+            Constructor for Metrics_Server
+            telemetry: Telemetry of the run
+            evaluator: Process_Evaluator or Socket_Evaluator whose workers to report, if any
+            host, port: Where to listen, port 0 picks a free one
+            prefix: Prepended to the Prometheus name of every metric
+        '''
+        self.telemetry = telemetry
+        self.evaluator = evaluator
+        self.prefix = prefix
+        handler = type('_Handler', (_Handler,), {'metrics': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def snapshot(self):
+        '''
+        Current value of every metric, workers as a list of their stats
+        '''
+        telemetry = self.telemetry
+        record = telemetry.last_record or {}
+        rss_mb, peak_mb = current_rss_mb(), peak_rss_mb()
+        return {'generation': telemetry.generation,
+                'generation_seconds': time.perf_counter() - telemetry.wall_start,
+                'generation_games': telemetry.games,
+                'games_total': telemetry.total_games,
+                'moves_total': telemetry.total_moves,
+                'games_per_second': record.get('games_per_second'),
+                'best_score': record.get('best_score'),
+                'median_score': record.get('median_score'),
+                'stages': record.get('stages', {}),
+                'rss_bytes': rss_mb * 2 ** 20 if rss_mb is not None else None,
+                'peak_rss_bytes': peak_mb * 2 ** 20 if peak_mb is not None else None,
+                'workers': self.evaluator.stats() if hasattr(self.evaluator, 'stats') else []}
+
+    def prometheus(self, snapshot=None):
+        '''
+        Prometheus text exposition of a snapshot
+        '''
+        snapshot = snapshot or self.snapshot()
+        samples = {name: [] for name in _metrics}
+        for name in _metrics:
+            if name in snapshot and snapshot[name] is not None:
+                samples[name].append(({}, snapshot[name]))
+        for stage, times in snapshot['stages'].items():
+            for clock, seconds in times.items():
+                samples['stage_seconds'].append(({'stage': stage, 'clock': clock}, seconds))
+        for worker in snapshot['workers']:
+            labels = {'worker': worker['name']}
+            samples['worker_games_total'].append((labels, worker['games']))
+            samples['worker_busy_seconds_total'].append((labels, worker['busy_seconds']))
+            samples['worker_utilization'].append((labels, worker['utilization']))
+
+        lines = []
+        for name, (kind, description) in _metrics.items():
+            if not samples[name]:
+                continue
+            full_name = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            for labels, value in samples[name]:
+                label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                lines.append(f'{full_name}{{{label_text}}} {float(value)!r}' if label_text
+                             else f'{full_name} {float(value)!r}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            body, content_type = self.metrics.prometheus().encode(), 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body, content_type = json.dumps(self.metrics.snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404, 'Try /metrics or /metrics.json')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown out the training output
+        pass
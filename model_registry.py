@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+from checkpoint import is_genome_file, read_header
+from connect_4 import default_game_board_size, default_connect
+from network import Network
+
+index_name = 'index.json'
+
+
+def content_hash(location):
+    '''
+    blake2b of a whole file, read in blocks
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    with open(location, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Model_Registry(object):
+    '''
+    Index of the models saved in a directory, loading each one the first time
+    it is used and keeping the most recently used ones in memory.
+
+    The index (name, score, generation, size and content hash of every model)
+    is kept in index.json in the directory, so a file is only hashed again
+    when its size or modification time changes.
+    '''
+
+    def __init__(self, directory='log', byte_budget=64 * 2 ** 20, mmap=True):
+        '''
+            Constructor for Model_Registry
+            directory: Where the models are saved
+            byte_budget: Bytes of weights kept loaded before the least recently used are dropped
+            mmap: Memory map the weights, the loaded networks are then read-only
+        '''
+        self.directory = directory
+        self.byte_budget = byte_budget
+        self.mmap = mmap
+        self.entries = {}
+        self.loaded = OrderedDict()
+        self.loaded_bytes = 0
+        self.hits = self.misses = 0
+        index = os.path.join(directory, index_name)
+        if os.path.exists(index):
+            with open(index) as file:
+                self.entries = json.load(file)
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Bring the index up to date with the files in the directory
+        '''
+        names = set()
+        if os.path.isdir(self.directory):
+            names = {name for name in os.listdir(self.directory)
+                     if not name.startswith('.') and name != index_name
+                     and os.path.isfile(os.path.join(self.directory, name))}
+        changed = False
+        for name in set(self.entries) - names:
+            del self.entries[name]
+            self.unload(name)
+            changed = True
+        for name in names:
+            location = os.path.join(self.directory, name)
+            stat = os.stat(location)
+            entry = self.entries.get(name)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+            if not is_genome_file(location):
+                continue
+            metadata = read_header(location)[0]['metadata']
+            # Names like 0_score_12 are from trainer.main, before scores went in the metadata
+            score = re.fullmatch(r'\d+_score_(-?\d+(?:\.\d+)?)', name)
+            self.entries[name] = {'name': name,
+                                  'score': metadata.get('score', float(score.group(1)) if score else None),
+                                  'generation': metadata.get('generation'),
+                                  'size': stat.st_size,
+                                  'mtime': stat.st_mtime,
+                                  'hash': content_hash(location)}
+            self.unload(name)
+            changed = True
+        if changed and os.path.isdir(self.directory):
+            self.save_index()
+
+    def save_index(self):
+        location = os.path.join(self.directory, index_name)
+        temp_location = location + '.tmp'
+        with open(temp_location, 'w') as file:
+            json.dump(self.entries, file, indent=1)
+        os.replace(temp_location, location)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def models(self):
+        '''
+        Index entries, best score first
+        '''
+        return sorted(self.entries.values(),
+                      key=lambda entry: (entry['score'] is None, -(entry['score'] or 0), entry['name']))
+
+    def load(self, name):
+        '''
+        The network saved as name, only read from disk when it is not loaded
+        '''
+        network = self.loaded.get(name)
+        if network is not None:
+            self.loaded.move_to_end(name)
+            self.hits += 1
+            return network
+        if name not in self.entries:
+            self.refresh()
+            if name not in self.entries:
+                raise KeyError(f'No model named {name} in {self.directory}')
+        self.misses += 1
+        network = Network.load(os.path.join(self.directory, name), mmap=self.mmap)
+        self.loaded[name] = network
+        self.loaded_bytes += network.genome().nbytes
+        # Always keep the model just asked for
+        while self.loaded_bytes > self.byte_budget and len(self.loaded) > 1:
+            self.unload(next(iter(self.loaded)))
+        return network
+
+    __getitem__ = load
+
+    def unload(self, name):
+        network = self.loaded.pop(name, None)
+        if network is not None:
+            self.loaded_bytes -= network.genome().nbytes
+
+    def board(self, name):
+        '''
+        game_board_size and connect the model named name was trained on, from
+        its metadata, 6x7 and 4 for models saved before they were stored there
+        '''
+        if name not in self.entries:
+            self.refresh()
+            if name not in self.entries:
+                raise KeyError(f'No model named {name} in {self.directory}')
+        metadata = read_header(os.path.join(self.directory, name))[0]['metadata']
+        return (tuple(metadata.get('game_board_size', default_game_board_size)),
+                metadata.get('connect', default_connect))
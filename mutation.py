@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class Mutator(object):
+    '''
+    Mutates layers in place with perturbations drawn from a numpy Generator.
+    All the noise for a layer, network or population comes from one draw into
+    a reused scratch buffer, so mutating allocates no temporaries.
+    '''
+    distributions = ('uniform', 'gaussian')
+
+    def __init__(self, mutation_rate=0.1, distribution='uniform', probability=1.0, seed=None):
+        '''
+            Constructor for Mutator
+            mutation_rate: Scale of the perturbations
+            distribution: 'uniform' for U(-1, 1) or 'gaussian' for N(0, 1) noise
+            probability: Chance each weight is mutated at all, below 1 gives sparse mutations
+            seed: Seed or numpy SeedSequence for the Generator and for any per-individual streams
+        '''
+        if distribution not in self.distributions:
+            raise ValueError(f'Unknown distribution {distribution}, expected one of {self.distributions}')
+        self.mutation_rate = mutation_rate
+        self.distribution = distribution
+        self.probability = probability
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+
+        self._noise = np.empty(0)
+        self._uniform = np.empty(0)
+        self._mask = np.empty(0, dtype=bool)
+
+    def streams(self, num):
+        '''
+        Independent, reproducible Generators, one per individual
+        '''
+        return [np.random.default_rng(seed) for seed in self.seed_sequence.spawn(num)]
+
+    def draw(self, size, rng=None, mutation_rate=None):
+        '''
+        Scaled perturbations for `size` parameters, a view into the scratch buffer
+        '''
+        rng = self.rng if rng is None else rng
+        mutation_rate = self.mutation_rate if mutation_rate is None else mutation_rate
+        if len(self._noise) < size:
+            self._noise = np.empty(size)
+            self._uniform = np.empty(size)
+            self._mask = np.empty(size, dtype=bool)
+        noise = self._noise[:size]
+
+        if self.distribution == 'uniform':
+            # U(0, 1) -> rate * U(-1, 1)
+            rng.random(out=noise)
+            np.multiply(noise, 2 * mutation_rate, out=noise)
+            np.subtract(noise, mutation_rate, out=noise)
+        else:
+            rng.standard_normal(out=noise)
+            np.multiply(noise, mutation_rate, out=noise)
+
+        if self.probability < 1:
+            uniform, mask = self._uniform[:size], self._mask[:size]
+            rng.random(out=uniform)
+            np.less(uniform, self.probability, out=mask)
+            np.multiply(noise, mask, out=noise)
+        return noise
+
+    def apply(self, parameters, rng=None, mutation_rate=None):
+        '''
+        Add one draw of noise across all the given arrays in place
+        '''
+        noise = self.draw(sum(param.size for param in parameters), rng=rng, mutation_rate=mutation_rate)
+        start = 0
+        for param in parameters:
+            end = start + param.size
+            np.add(param, noise[start:end].reshape(param.shape), out=param)
+            start = end
+
+    def mutate_layer(self, layer, rng=None, mutation_rate=None):
+        self.apply([layer.weights, layer.bias], rng=rng, mutation_rate=mutation_rate)
+
+    def mutate_network(self, network, rng=None, mutation_rate=None):
+        self.apply(parameters(network), rng=rng, mutation_rate=mutation_rate)
+
+    def mutate_population(self, networks, rngs=None, mutation_rate=None):
+        '''
+        Mutate every network, with one draw for all of them or one per stream in rngs
+        '''
+        if rngs is None:
+            self.apply([param for network in networks for param in parameters(network)],
+                       mutation_rate=mutation_rate)
+        else:
+            for network, rng in zip(networks, rngs):
+                self.mutate_network(network, rng=rng, mutation_rate=mutation_rate)
+
+
+def parameters(network):
+    '''
+    The flat genome holding every weight and bias of a network
+    '''
+    return [network.genome()]
+
+
+default_mutator = Mutator()
@@ -1,12 +1,49 @@
 import numpy as np
-from random import uniform, random
 import pickle
 
+from mutation import default_mutator
+from checkpoint import write_genomes, read_genomes, is_genome_file
+
+def genome_length(layer_sizes):
+    '''
+    Number of weights and biases in a network with the given (num_in, num_out) layers
+    '''
+    return sum(num_out * (num_in + 1) for num_in, num_out in layer_sizes)
+
+
+def board_layer_sizes(game_board_size, hidden_sizes=(32, 22)):
+    '''
+    (num_in, num_out) layers of a network that sees every cell of a
+    (num_rows, num_cols) board and scores every column
+    '''
+    num_rows, num_cols = game_board_size
+    sizes = [num_rows * num_cols, *hidden_sizes, num_cols]
+    return list(zip(sizes[:-1], sizes[1:]))
+
+
 class Layer(object):
-    def __init__(self, num_in, num_out):
-        self.weights = np.zeros((num_out, num_in))
-        self.bias = np.zeros(num_out)
-        self.mutate(mutation_rate=1)
+    __slots__ = ('weights', 'bias')
+
+    def __init__(self, num_in, num_out, params=None):
+        '''
+            Constructor for Layer
+            params: Flat float32 array of num_out * (num_in + 1) values for the
+                weights and bias to view, random new ones when None
+        '''
+        randomize = params is None
+        if randomize:
+            params = np.zeros(num_out * (num_in + 1), dtype=np.float32)
+        self.weights = params[:num_out * num_in].reshape(num_out, num_in)
+        self.bias = params[num_out * num_in:]
+        if randomize:
+            self.mutate(mutation_rate=1)
+
+    def __setstate__(self, state):
+        # Pickles from before __slots__ hold a plain dict
+        if isinstance(state, tuple):
+            state = state[1]
+        self.weights = state['weights']
+        self.bias = state['bias']
 
     def forward(self, x):
         '''
@@ -17,25 +54,58 @@ class Layer(object):
         x = 1 / (1 + np.exp(-x))
         return x
 
-    def mutate(self, mutation_rate=0.1):
+    def mutate(self, mutation_rate=0.1, mutator=default_mutator):
         '''
         Mutate the weights
         '''
-        for row in range(self.weights.shape[0]):
-            for col in range(self.weights.shape[1]):
-                # Add a random amount to each weight
-                self.weights[row, col] += mutation_rate * uniform(-1, 1)
-        for i in range(self.bias.shape[0]):
-            # Add a random amount to each bias
-            self.bias[i] += mutation_rate * uniform(-1, 1)
-        
-    
+        # Add a random amount to each weight and bias
+        mutator.mutate_layer(self, mutation_rate=mutation_rate)
+
 
 class Network(object):
-    def __init__(self):
+    '''
+    MLP whose layers are views into one flat float32 genome
+    '''
+    __slots__ = ('layers', '_genome')
+    layer_sizes = board_layer_sizes((6, 7))
+
+    def __init__(self, genome=None, layer_sizes=layer_sizes):
+        '''
+            Constructor for Network
+            genome: Flat float32 array to view, such as a row of a Genome_Arena,
+                random new weights when None
+            layer_sizes: (num_in, num_out) of each layer
+        '''
+        randomize = genome is None
+        if randomize:
+            genome = np.zeros(genome_length(layer_sizes), dtype=np.float32)
+        self._genome = genome
+
         # The layers of the MLP
-        self.layers = [Layer(42, 32), Layer(32, 22), Layer(22, 7)]
-    
+        self.layers = []
+        start = 0
+        for num_in, num_out in layer_sizes:
+            end = start + num_out * (num_in + 1)
+            self.layers.append(Layer(num_in, num_out, genome[start:end]))
+            start = end
+        if randomize:
+            self.mutate(mutation_rate=1)
+
+    def __reduce__(self):
+        return Network.from_genome, (self._genome, self.layout())
+
+    def __deepcopy__(self, memo):
+        return Network.from_genome(self._genome, self.layout())
+
+    def __setstate__(self, state):
+        # Pickles from before __slots__ hold a plain dict of separate layers
+        if isinstance(state, tuple):
+            state = state[1]
+        layers = state['layers']
+        self.__init__(np.concatenate([param.reshape(-1) for layer in layers
+                                      for param in (layer.weights, layer.bias)]).astype(np.float32),
+                      [layer.weights.shape[::-1] for layer in layers])
+
     def forward(self, x):
         '''
         Forward pass
@@ -52,22 +122,164 @@ class Network(object):
         x = self.forward(x)
         return int(np.argmax(x))
 
-    def mutate(self, mutation_rate=0.1):
+    def mutate(self, mutation_rate=0.1, mutator=default_mutator):
         '''
         Mutate all layers
         '''
-        for layer in self.layers:
-            layer.mutate(mutation_rate=mutation_rate)
-        
-    def save(self, location):
+        mutator.mutate_network(self, mutation_rate=mutation_rate)
+
+    def layout(self):
+        '''
+        Shape of each weight and bias array, in genome order
+        '''
+        return [param.shape for layer in self.layers for param in (layer.weights, layer.bias)]
+
+    def genome(self):
+        '''
+        All weights and biases as one flat array, the layers are views into it
+        '''
+        return self._genome
+
+    @classmethod
+    def from_genome(cls, genome, layout):
+        '''
+        Network with a copy of the weights and biases of a flat genome
+        '''
+        layer_sizes = [(shape[1], shape[0]) for shape in layout[::2]]
+        return cls(np.array(genome, dtype=np.float32), layer_sizes)
+
+    def save(self, location, **metadata):
         '''
         Save to file
         '''
-        pickle.dump(self, open(location, 'wb'))
+        write_genomes(location, self.genome()[None], self.layout(), metadata)
 
     @staticmethod
-    def load(location):
+    def load(location, allow_pickle=False, mmap=False):
         '''
         Load layers from files
+            allow_pickle: Also load networks pickled by older versions, only for trusted files
+            mmap: View the weights in the memory mapped file instead of copying
+                them, the network is then read-only
+        '''
+        if not is_genome_file(location):
+            if not allow_pickle:
+                raise ValueError(f'{location} is not a genome file, pass allow_pickle=True to unpickle it')
+            with open(location, 'rb') as file:
+                return pickle.load(file)
+        genomes, layout, _ = read_genomes(location, mmap=mmap)
+        if mmap:
+            return Network(genomes[0], [(shape[1], shape[0]) for shape in layout[::2]])
+        return Network.from_genome(genomes[0], layout)
+
+
+class Genome_Arena(object):
+    '''
+    A whole population in one preallocated (capacity, genome_length) float32
+    block. Each row backs one Network, so copying and replacing individuals
+    writes into the rows instead of allocating new networks.
+    '''
+    def __init__(self, capacity, layer_sizes=Network.layer_sizes):
+        self.genomes = np.zeros((capacity, genome_length(layer_sizes)), dtype=np.float32)
+        self.layer_sizes = layer_sizes
+        self.networks = [Network(row, layer_sizes) for row in self.genomes]
+
+    def __len__(self):
+        return len(self.networks)
+
+    def copy(self, source, target):
+        '''
+        Overwrite the target network's weights with the source's
+        '''
+        np.copyto(target.genome(), source.genome())
+
+    def randomize(self, network, mutator=default_mutator):
+        '''
+        Give a network new random weights, the same as a new Network()
+        '''
+        network.genome().fill(0)
+        mutator.mutate_network(network, mutation_rate=1)
+
+    def population(self, start=0, stop=None):
+        '''
+        Population over a range of rows, without copying them
+        '''
+        return Population.from_genomes(self.genomes[start:stop], self.layer_sizes)
+
+
+class Population(object):
+    '''
+    Inference for a whole population at once. Each layer's weights are stacked
+    into a contiguous (P, num_out, num_in) tensor so a batch of boards played
+    by different networks goes through one matmul per layer.
+    '''
+    def __init__(self, networks):
+        layer_sizes = [layer.weights.shape[::-1] for layer in networks[0].layers]
+        population = Population.from_genomes(np.stack([network.genome() for network in networks]), layer_sizes)
+        self.weights, self.biases = population.weights, population.biases
+
+    @classmethod
+    def from_genomes(cls, genomes, layer_sizes):
+        '''
+        View (P, genome_length) genomes as stacked weights and biases without copying them
+        '''
+        weights, biases, start = [], [], 0
+        for num_in, num_out in layer_sizes:
+            weights.append(genomes[:, start:start + num_out * num_in].reshape(-1, num_out, num_in))
+            start += num_out * num_in
+            biases.append(genomes[:, start:start + num_out])
+            start += num_out
+        return cls.from_arrays(weights, biases)
+
+
+    @classmethod
+    def from_arrays(cls, weights, biases):
+        '''
+        Use already stacked weights and biases without copying them
+        '''
+        population = cls.__new__(cls)
+        population.weights = list(weights)
+        population.biases = list(biases)
+        return population
+
+    def __len__(self):
+        return len(self.weights[0])
+
+    def forward(self, indexes, x):
+        '''
+        Forward pass of board x[i] through network indexes[i]
+        '''
+        indexes = np.asarray(indexes, dtype=np.int64)
+        x = x.reshape(len(indexes), -1)
+        networks, inverse, counts = np.unique(indexes, return_inverse=True, return_counts=True)
+
+        # Without too much padding, give each network a row of boards so its
+        # weights are broadcast instead of copied once per board
+        if len(networks) * counts.max() > 2 * len(indexes):
+            return self._forward(indexes, x)
+        order = np.argsort(inverse, kind='stable')
+        rank = np.empty(len(indexes), dtype=np.int64)
+        rank[order] = np.arange(len(indexes)) - (np.cumsum(counts) - counts)[inverse[order]]
+        padded = np.zeros((len(networks), counts.max(), x.shape[1]), dtype=x.dtype)
+        padded[inverse, rank] = x
+        padded = self._forward(networks, padded, broadcast=True)
+        return padded[inverse, rank]
+
+    def _forward(self, indexes, x, broadcast=False):
+        '''
+        Same operations as Layer.forward, batched over the first axis
+        '''
+        for weights, bias in zip(self.weights, self.biases):
+            weights, bias = weights[indexes], bias[indexes]
+            if broadcast:
+                weights, bias = weights[:, None], bias[:, None]
+            x = np.matmul(weights, x[..., None])[..., 0]
+            x = bias + x
+            x = 1 / (1 + np.exp(-x))
+        return x
+
+    def __call__(self, indexes, x):
+        '''
+        The move network indexes[i] plays on board x[i], usable as a Batch_Connect_4 policy
         '''
-        return pickle.load(open(location, 'rb'))
+        return np.argmax(self.forward(indexes, x), axis=-1)
@@ -0,0 +1,170 @@
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from batch_game import Batch_Connect_4, score_games
+from connect_4 import default_game_board_size, default_connect
+from network import Population
+
+
+class Process_Evaluator(object):
+    '''
+    Plays tournaments on a pool of worker processes. The population's weights
+    are published once per generation into a shared memory block, which the
+    workers read without copying, and each worker returns the score deltas of
+    the chunk of pairings it played.
+    '''
+
+    def __init__(self, num_workers=None, chunk_size=None, game_board_size=default_game_board_size,
+                 connect=default_connect):
+        '''
+            Constructor for Process_Evaluator
+            num_workers: Number of worker processes, defaults to the number of cores
+            chunk_size: Pairings per task, defaults to an even split into 4 tasks per worker
+            game_board_size, connect: Board the games are played on
+        '''
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.board = (tuple(game_board_size), connect)
+        self.pool = None
+        self.shared = None
+        self.layout = None
+        # Games and busy time of every worker process, by pid
+        self.workers = {}
+        self.started = None
+
+    def publish(self, networks):
+        '''
+        Copy the weights of the networks into shared memory
+        '''
+        population = Population(networks)
+        layout = [array.shape for array in population.weights + population.biases]
+        if layout != self.layout:
+            # The workers attach to the block when they start, so a new shape needs a new pool
+            self.close()
+            size = sum(math.prod(shape) for shape in layout) * np.dtype(np.float32).itemsize
+            self.shared = SharedMemory(create=True, size=size)
+            self.layout = layout
+            self.pool = multiprocessing.Pool(self.num_workers, initializer=_attach,
+                                             initargs=(self.shared.name, layout, self.board))
+            self.workers = {}
+            self.started = time.perf_counter()
+        for target, array in zip(_views(self.shared.buf, layout), population.weights + population.biases):
+            target[...] = array
+
+    def rate(self, networks, pairings):
+        '''
+        Scores of the networks after playing every pairing
+        '''
+        chunks = self._chunks(networks, pairings)
+        scores = np.zeros(len(networks), dtype=np.int64)
+        for deltas, pid, num_games, seconds in self.pool.imap_unordered(_timed_rate_chunk, chunks):
+            self._count(pid, num_games, seconds)
+            scores += deltas
+        return scores
+
+    def play(self, networks, pairings):
+        '''
+        Winner and number of moves of every pairing
+        '''
+        chunks = self._chunks(networks, pairings)
+        results = []
+        for result, pid, num_games, seconds in self.pool.map(_timed_play_chunk, chunks, chunksize=1):
+            self._count(pid, num_games, seconds)
+            results.append(result)
+        results = np.concatenate(results or [np.zeros((2, 0), dtype=np.int64)], axis=1)
+        return results[0], results[1]
+
+    def _count(self, pid, num_games, seconds):
+        # Replaced whole, so stats() called from another thread never sees a half updated worker
+        worker = self.workers.get(pid, {'games': 0, 'batches': 0, 'busy_seconds': 0.})
+        self.workers[pid] = {'games': worker['games'] + num_games, 'batches': worker['batches'] + 1,
+                             'busy_seconds': worker['busy_seconds'] + seconds}
+
+    def stats(self):
+        '''
+        Games played and throughput of every worker process of the current pool
+        '''
+        uptime = time.perf_counter() - self.started if self.started is not None else 0.
+        return [{'name': f'process {pid}', 'alive': True, 'games': worker['games'], 'batches': worker['batches'],
+                 'busy_seconds': worker['busy_seconds'],
+                 'games_per_second': worker['games'] / worker['busy_seconds'] if worker['busy_seconds'] else 0.,
+                 'utilization': worker['busy_seconds'] / uptime if uptime else 0.}
+                for pid, worker in self.workers.copy().items()]
+
+    def _chunks(self, networks, pairings):
+        pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+        self.publish(networks)
+        chunk_size = self.chunk_size or max(1, math.ceil(len(pairings) / (4 * self.num_workers)))
+        return [pairings[start:start + chunk_size] for start in range(0, len(pairings), chunk_size)]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+            self.layout = None
+            self.workers = {}
+            self.started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _views(buffer, layout):
+    '''
+    Numpy arrays over consecutive regions of the buffer
+    '''
+    views, offset = [], 0
+    for shape in layout:
+        view = np.ndarray(shape, dtype=np.float32, buffer=buffer, offset=offset)
+        views.append(view)
+        offset += view.nbytes
+    return views
+
+
+# State of each worker process
+_shared = None
+_population = None
+_board = (default_game_board_size, default_connect)
+
+
+def _attach(name, layout, board):
+    global _shared, _population, _board
+    _shared = SharedMemory(name=name)
+    _board = board
+    views = _views(_shared.buf, layout)
+    for view in views:
+        view.flags.writeable = False
+    num_layers = len(layout) // 2
+    _population = Population.from_arrays(views[:num_layers], views[num_layers:])
+
+
+def _play_chunk(pairings):
+    games = Batch_Connect_4(_population, pairings, *_board)
+    return np.stack([games.run_game(), games.num_moves])
+
+
+def _rate_chunk(pairings):
+    return score_games(pairings, _play_chunk(pairings)[0], len(_population))
+
+
+def _timed_play_chunk(pairings):
+    start = time.perf_counter()
+    return _play_chunk(pairings), os.getpid(), len(pairings), time.perf_counter() - start
+
+
+def _timed_rate_chunk(pairings):
+    start = time.perf_counter()
+    return _rate_chunk(pairings), os.getpid(), len(pairings), time.perf_counter() - start
@@ -1,9 +1,30 @@
-from network import Network
+from model_registry import Model_Registry
 from connect_4 import Connect_4
+from quantize import inference_network
+from game_records import Game_Records, replay
 
+# One of quantize.modes, 'float64' plays exactly as trained, 'float32' is a little
+# faster one board at a time and rarely picks another move
+inference = 'float64'
+
+# Models stay loaded between games
+registry = Model_Registry("log")
+
+# A model name in log/ to play against it, or `replay <record file> <game index>`
+# to watch a stored game
 net_to_load = input()
 while not net_to_load == "":
-    net = Network.load("log/" + net_to_load)
-    game = Connect_4([None, net], headless=True, printing=True)
+    if net_to_load.startswith("replay "):
+        _, location, idx = net_to_load.split()
+        records = Game_Records(location)
+        generation, players, winner, moves = records[int(idx)]
+        print(f"Generation {generation}: player {players[0]} against player {players[1]}")
+        game = Connect_4(replay(moves), headless=True, printing=True, game_board_size=records.game_board_size,
+                         connect=records.connect)
+    else:
+        net = inference_network(registry.load(net_to_load), inference)
+        game_board_size, connect = registry.board(net_to_load)
+        game = Connect_4([None, net], headless=True, printing=True, game_board_size=game_board_size,
+                         connect=connect)
     winner = game.run_game()
     net_to_load = input()
\ No newline at end of file
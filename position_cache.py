@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+from match_cache import fingerprint
+
+
+class Position_Cache(object):
+    '''
+    Bounded LRU of the move a network plays on each board it has seen, one
+    per network. Networks are keyed by the fingerprint of their weights, so
+    every copy of a survivor shares one memo and keeps it into the next
+    generation, while a network that is mutated, copied over or randomized
+    starts again with an empty one.
+
+    Boards are not mirrored: the networks are not left-right symmetric, and
+    neither are the rules, which count down-right diagonals but not up-right ones.
+    '''
+
+    def __init__(self, positions_per_network=10000, max_networks=1000):
+        '''
+            Constructor for Position_Cache
+            positions_per_network: Boards remembered per network before the least recently used are dropped
+            max_networks: Networks remembered before the least recently used are dropped
+        '''
+        self.positions_per_network = positions_per_network
+        self.max_networks = max_networks
+        self.tables = OrderedDict()
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def memo(self, network, player=None):
+        '''
+        Connect_4 callback that plays the moves of player, by default the
+        network itself, remembered under the network's weights
+        '''
+        key = fingerprint(network)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.tables[key] = OrderedDict()
+            while len(self.tables) > self.max_networks:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(key)
+        return _Memo_Player(self, table, network if player is None else player)
+
+    def take_counts(self):
+        '''
+        Hits and misses since the last call, which are added to the totals
+        '''
+        counts = {'position_hits': self.hits, 'position_misses': self.misses,
+                  'position_hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.,
+                  'position_networks': len(self.tables)}
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+        return counts
+
+    def report(self):
+        hits, misses = self.total_hits + self.hits, self.total_misses + self.misses
+        rate = hits / (hits + misses) if hits + misses else 0.
+        return f'Position cache: {hits:,} of {hits + misses:,} moves remembered ({rate:.1%}), {misses:,} computed'
+
+
+class _Memo_Player(object):
+    __slots__ = ('cache', 'table', 'player')
+
+    def __init__(self, cache, table, player):
+        self.cache = cache
+        self.table = table
+        self.player = player
+
+    def __call__(self, board):
+        '''
+        The callback for showing board
+        '''
+        key = board.tobytes()
+        move = self.table.get(key)
+        if move is not None:
+            self.table.move_to_end(key)
+            self.cache.hits += 1
+            return move
+        self.cache.misses += 1
+        move = self.table[key] = self.player(board)
+        if len(self.table) > self.cache.positions_per_network:
+            self.table.popitem(last=False)
+        return move
@@ -0,0 +1,149 @@
+'''
+Low precision copies of trained networks for playing
+
+Only the argmax of a network's output matters, so the last layer's sigmoid
+is skipped in every mode here: it is monotonic and can't change the move.
+
+    float32: float32 weights, activations and math
+    int8: int8 weights with one scale per layer, boards and sigmoid outputs
+        quantized to integers so each layer is an integer matmul
+
+hidden_activation='hard_sigmoid' also swaps the hidden sigmoids for
+clip(x / 4 + 1 / 2, 0, 1), which is cheaper but can change the move.
+'''
+import numpy as np
+
+from network import Population
+
+modes = ('float64', 'float32', 'int8')
+hidden_activations = ('sigmoid', 'hard_sigmoid')
+
+# Sigmoid outputs in [0, 1] are quantized to multiples of 1 / activation_levels
+activation_levels = 255
+
+
+def quantize(weights):
+    '''
+    Symmetric int8 quantization, returns the int8 weights and their scale
+    '''
+    scale = float(np.abs(weights).max()) / 127 or 1.
+    return np.round(weights / scale).astype(np.int8), np.float32(scale)
+
+
+class Quantized_Network(object):
+    '''
+    Read-only low precision copy of a Network, usable as a Connect_4 callback
+    '''
+
+    def __init__(self, network, mode='float32', hidden_activation='sigmoid'):
+        '''
+            Constructor for Quantized_Network
+            mode: 'float32' or 'int8'
+            hidden_activation: One of hidden_activations
+        '''
+        if mode not in modes[1:]:
+            raise ValueError(f'Unknown mode {mode}, expected one of {modes[1:]}')
+        if hidden_activation not in hidden_activations:
+            raise ValueError(f'Unknown activation {hidden_activation}, expected one of {hidden_activations}')
+        self.mode = mode
+        self.hidden_activation = hidden_activation
+        self.biases = [layer.bias.astype(np.float32) for layer in network.layers]
+        if mode == 'float32':
+            self.weights = [layer.weights.astype(np.float32) for layer in network.layers]
+            self.scales = [np.float32(1)] * len(network.layers)
+        else:
+            self.weights, self.scales = map(list, zip(*[quantize(layer.weights) for layer in network.layers]))
+            # Every layer after the first gets sigmoid outputs times activation_levels
+            self.scales[1:] = [scale / np.float32(activation_levels) for scale in self.scales[1:]]
+        # What the matmuls use, the int8 values held exactly as float32
+        self._weights = [weights.astype(np.float32) for weights in self.weights]
+
+    def forward(self, x):
+        '''
+        Forward pass, the scores before the last sigmoid
+        '''
+        x = x.reshape(-1).astype(np.float32)
+        for layer, (weights, scale, bias) in enumerate(zip(self._weights, self.scales, self.biases)):
+            x = _layer(self.mode, self.hidden_activation, weights, scale, bias, x,
+                       last=layer == len(self.weights) - 1)
+        return x
+
+    def __call__(self, x):
+        '''
+        The callback for showing board
+        '''
+        return int(np.argmax(self.forward(x)))
+
+
+class Quantized_Population(Population):
+    '''
+    Low precision network.Population, usable as a Batch_Connect_4 policy
+    '''
+
+    def __init__(self, networks, mode='float32', hidden_activation='sigmoid'):
+        copies = [Quantized_Network(network, mode, hidden_activation) for network in networks]
+        self.mode = mode
+        self.hidden_activation = hidden_activation
+        self.weights = [np.stack(layer) for layer in zip(*[copy.weights for copy in copies])]
+        self.scales = [np.array(layer, dtype=np.float32) for layer in zip(*[copy.scales for copy in copies])]
+        self.biases = [np.stack(layer) for layer in zip(*[copy.biases for copy in copies])]
+        # What the matmuls use, converted once instead of on every move
+        self._weights = [weights.astype(np.float32) for weights in self.weights]
+
+    def forward(self, indexes, x):
+        '''
+        Forward pass of board x[i] through network indexes[i], before the last sigmoid
+        '''
+        return super().forward(indexes, x.astype(np.float32))
+
+    def _forward(self, indexes, x, broadcast=False):
+        for layer, (weights, scale, bias) in enumerate(zip(self._weights, self.scales, self.biases)):
+            weights, scale, bias = weights[indexes], scale[indexes, None], bias[indexes]
+            if broadcast:
+                weights, scale, bias = weights[:, None], scale[:, None], bias[:, None]
+            x = _layer(self.mode, self.hidden_activation, weights, scale, bias, x,
+                       last=layer == len(self.weights) - 1)
+        return x
+
+
+def _layer(mode, hidden_activation, weights, scale, bias, x, last):
+    '''
+    One layer of a single or batched network, x is float32 either way.
+
+    In int8 mode x holds integers (board values, or sigmoid outputs times
+    activation_levels) and the weights are int8, so every product and partial
+    sum is an integer below 2 ** 24 and the float32 matmul is exact integer
+    arithmetic that still goes through BLAS.
+    '''
+    if mode == 'int8':
+        x = np.matmul(weights, x[..., None])[..., 0] * scale + bias
+    else:
+        x = np.matmul(weights, x[..., None])[..., 0] + bias
+    if last:
+        return x
+    if hidden_activation == 'sigmoid':
+        x = 1 / (1 + np.exp(-x))
+    else:
+        x = np.clip(x * np.float32(.25) + np.float32(.5), 0, 1)
+    if mode == 'int8':
+        # The next layer's scale takes the 1 / activation_levels back out
+        x = np.round(x * np.float32(activation_levels))
+    return x
+
+
+def inference_network(network, mode='float64', hidden_activation='sigmoid'):
+    '''
+    The network itself for float64, a Quantized_Network otherwise
+    '''
+    if mode == 'float64' and hidden_activation == 'sigmoid':
+        return network
+    return Quantized_Network(network, mode, hidden_activation)
+
+
+def inference_population(networks, mode='float64', hidden_activation='sigmoid'):
+    '''
+    A network.Population for float64, a Quantized_Population otherwise
+    '''
+    if mode == 'float64' and hidden_activation == 'sigmoid':
+        return Population(networks)
+    return Quantized_Population(networks, mode, hidden_activation)
@@ -0,0 +1,87 @@
+'''
+Drawing helpers for the pygame front-ends
+
+Fonts are loaded once and rendered text is kept, so redrawing a label is a
+blit. Everything drawn through a Renderer marks its rectangle dirty and
+update() only pushes those rectangles to the display, nothing when
+nothing changed.
+'''
+import pygame
+
+
+class Glyph_Cache(object):
+    '''
+    Fonts loaded once and text surfaces rendered once per (text, color)
+    '''
+    _fonts = {}
+
+    def __init__(self, font_name='arial', size=40, max_size=512):
+        '''
+            Constructor for Glyph_Cache
+            font_name, size: The system font to render with
+            max_size: Rendered surfaces kept before the cache is cleared
+        '''
+        self.font_name = font_name
+        self.size = size
+        self.max_size = max_size
+        self.surfaces = {}
+
+    @property
+    def font(self):
+        # Shared between caches, SysFont searches the system fonts every call
+        key = (self.font_name, self.size)
+        if key not in Glyph_Cache._fonts:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            Glyph_Cache._fonts[key] = pygame.font.SysFont(self.font_name, self.size)
+        return Glyph_Cache._fonts[key]
+
+    def render(self, text, color):
+        key = (str(text), tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= self.max_size:
+                self.surfaces.clear()
+            surface = self.surfaces[key] = self.font.render(key[0], True, color)
+        return surface
+
+
+class Renderer(object):
+    '''
+    Draws onto a surface and tracks the rectangles that changed
+    '''
+
+    def __init__(self, surface, glyphs=None):
+        '''
+            Constructor for Renderer
+            surface: The display surface to draw on
+            glyphs: Glyph_Cache for text, a shared arial 40 one when None
+        '''
+        self.surface = surface
+        self.glyphs = glyphs or Glyph_Cache()
+        self.dirty = []
+
+    def rect(self, color, rect):
+        self.dirty.append(pygame.draw.rect(self.surface, color, rect))
+
+    def circle(self, color, center, radius):
+        self.dirty.append(pygame.draw.circle(self.surface, color, center, radius))
+
+    def text(self, text, x, y, color):
+        self.dirty.append(self.surface.blit(self.glyphs.render(text, color), (x, y)))
+
+    def invalidate(self):
+        '''
+        Mark the whole surface as changed
+        '''
+        self.dirty.append(self.surface.get_rect())
+
+    def update(self):
+        '''
+        Push the changed rectangles to the display, returns how many there were
+        '''
+        num_dirty = len(self.dirty)
+        if num_dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
+        return num_dirty
@@ -0,0 +1,176 @@
+'''
+Alpha-beta search opponent, with the same rules as connect_4._Bitboard_Gamestate:
+lines only count vertically, horizontally and down-right, and a game with
+max_moves stones on the board is a draw.
+'''
+import numpy as np
+
+from connect_4 import default_game_board_size, default_connect, max_moves as draw_moves, win_shifts
+
+# Higher than any heuristic value, a win after n stones scores win_score - n
+win_score = 1000
+
+
+class Negamax_Player(object):
+    '''
+    Depth limited negamax with alpha-beta pruning, center-first move ordering
+    and a transposition table, usable as a Connect_4 callback.
+
+    Moves are searched in a fixed order and ties go to the first move, so the
+    player is deterministic: the same board always gets the same move.
+    '''
+
+    def __init__(self, depth=4, game_board_size=default_game_board_size, connect=default_connect, max_moves=None,
+                 table_size=1000000):
+        '''
+            Constructor for Negamax_Player
+            depth: Plies searched past the move being chosen
+            game_board_size: (num_rows, num_cols) of the board
+            connect: Stones in a line needed to win
+            max_moves: Stones on the board when the game is a draw, one short of a full board when None
+            table_size: Positions kept in the transposition table before it is cleared
+        '''
+        self.depth = depth
+        self.num_rows, self.num_cols = game_board_size
+        self.max_moves = draw_moves(game_board_size) if max_moves is None else max_moves
+        self.table_size = table_size
+        self.table = {}
+        self.moves = {}
+        self.nodes = 0
+
+        height = self.num_rows + 1
+        # Same lines as connect_4._Bitboard_Gamestate
+        self.shifts = win_shifts(self.num_rows, connect)
+        center = self.num_cols // 2
+        self.order = sorted(range(self.num_cols), key=lambda col: (abs(col - center), col))
+        self.bottoms = [1 << (col * height) for col in self.order]
+        self.tops = [1 << (col * height + self.num_rows - 1) for col in self.order]
+        self.column_masks = [((1 << self.num_rows) - 1) << (col * height) for col in self.order]
+        # Stones in the middle columns count for a little at the search horizon
+        self.center_mask = sum(((1 << self.num_rows) - 1) << (col * height)
+                               for col in range(self.num_cols) if abs(col - center) <= 1)
+
+    def __call__(self, board):
+        '''
+        The callback for showing board
+        '''
+        position, mask, num_moves = self.from_board(board)
+        return self.best_move(position, mask, num_moves)
+
+    def from_board(self, board):
+        '''
+        Bitboards of the player to move and of every stone, and the number of
+        stones, from a (num_rows, num_cols) board of -1, 0 and 1
+        '''
+        board = np.asarray(board)
+        boards = [0, 0]
+        height = self.num_rows + 1
+        for row, col in zip(*np.nonzero(board != -1)):
+            boards[int(board[row, col])] |= 1 << (int(col) * height + self.num_rows - 1 - int(row))
+        counts = [bin(stones).count('1') for stones in boards]
+        # The first player has moved once more than the second when it is the second's turn
+        player = 0 if counts[0] == counts[1] else 1
+        return boards[player], boards[0] | boards[1], counts[0] + counts[1]
+
+    def best_move(self, position, mask, num_moves):
+        '''
+        Column to play, the center-most of the best moves
+        '''
+        key = (position, mask)
+        if key in self.moves:
+            return self.moves[key]
+        if len(self.table) > self.table_size:
+            self.table.clear()
+            self.moves.clear()
+
+        best, best_value = None, None
+        alpha, beta = -win_score - 1, win_score + 1
+        for idx, col in enumerate(self.order):
+            if mask & self.tops[idx]:
+                continue
+            move = (mask + self.bottoms[idx]) & self.column_masks[idx]
+            if self._won(position | move):
+                best = col
+                break
+            value = -self._negamax(position ^ mask, mask | move, num_moves + 1, self.depth, -beta, -alpha)
+            if best is None or value > best_value:
+                best, best_value = col, value
+                alpha = max(alpha, value)
+        self.moves[key] = best
+        return best
+
+    def _won(self, position):
+        for shifts in self.shifts:
+            run = position
+            for shift in shifts:
+                run &= run >> shift
+            if run:
+                return True
+        return False
+
+    def _negamax(self, position, mask, num_moves, depth, alpha, beta):
+        '''
+        Value of the position for the player to move, whose stones are position
+        '''
+        self.nodes += 1
+        if num_moves >= self.max_moves:
+            return 0
+
+        moves = []
+        for idx in range(self.num_cols):
+            if not mask & self.tops[idx]:
+                move = (mask + self.bottoms[idx]) & self.column_masks[idx]
+                if self._won(position | move):
+                    return win_score - num_moves
+                moves.append(move)
+        if not moves:
+            return 0
+        if depth == 0:
+            return bin(position & self.center_mask).count('1') - bin((position ^ mask) & self.center_mask).count('1')
+
+        # Entries are only used at the depth they were searched to, so the
+        # value of a position does not depend on what was searched before
+        key = (position, mask, depth)
+        entry = self.table.get(key)
+        if entry is not None:
+            lower, upper = entry
+            if lower >= beta:
+                return lower
+            if upper <= alpha:
+                return upper
+            alpha, beta = max(alpha, lower), min(beta, upper)
+
+        original_alpha, original_beta = alpha, beta
+        value = -win_score - 1
+        for move in moves:
+            value = max(value, -self._negamax(position ^ mask, mask | move, num_moves + 1, depth - 1, -beta, -alpha))
+            if value >= beta:
+                break
+            alpha = max(alpha, value)
+
+        lower, upper = entry if entry is not None else (-win_score - 1, win_score + 1)
+        if value <= original_alpha:
+            upper = min(upper, value)
+        elif value >= original_beta:
+            lower = max(lower, value)
+        else:
+            lower = upper = value
+        self.table[key] = (lower, upper)
+        return value
+
+
+def ladder_policy(network_policy, num_networks, opponents):
+    '''
+    Batch_Connect_4 policy where players below num_networks are networks and
+    player num_networks + i is the Connect_4 callback opponents[i]
+    '''
+    def policy(players, boards):
+        players = np.asarray(players)
+        moves = np.empty(len(players), dtype=np.int64)
+        networks = players < num_networks
+        if networks.any():
+            moves[networks] = network_policy(players[networks], boards[networks])
+        for idx in np.flatnonzero(~networks):
+            moves[idx] = opponents[players[idx] - num_networks](boards[idx])
+        return moves
+    return policy
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Telemetry(object):
+    '''
+    Per-generation timing and memory records, appended as one json line per
+    generation. Each stage costs a couple of clock reads, so it can stay on;
+    tracemalloc only runs during the generations it samples.
+    '''
+
+    def __init__(self, location=None, tracemalloc_every=0, top_allocators=10):
+        '''
+            Constructor for Telemetry
+            location: JSONL file to append records to, None to only keep the latest record
+            tracemalloc_every: Trace allocations of every nth generation, 0 to never
+            top_allocators: Number of allocation sites kept from each traced generation
+        '''
+        self.file = None
+        if location is not None:
+            directory = os.path.dirname(location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(location, 'a', buffering=1)
+        self.tracemalloc_every = tracemalloc_every
+        self.top_allocators = top_allocators
+        self.last_record = None
+        self.tracing = False
+        # Only ever added to, for anything reading them while the run goes on
+        self.total_games = 0
+        self.total_moves = 0
+        self.start_generation(0)
+
+    def start_generation(self, generation):
+        '''
+        Reset the counters and clocks for a new generation
+        '''
+        self.generation = generation
+        self.stages = {}
+        self.notes = {}
+        self.games = 0
+        self.moves = 0
+        if self.tracing:
+            # The previous generation never ended
+            tracemalloc.stop()
+        self.tracing = bool(self.tracemalloc_every) and generation % self.tracemalloc_every == 0 \
+            and not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Add the wall and CPU time of the block to the stage
+        '''
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {'wall': 0., 'cpu': 0.})
+            totals['wall'] += time.perf_counter() - wall
+            totals['cpu'] += time.process_time() - cpu
+
+    def count_games(self, num_games, num_moves):
+        self.games += num_games
+        self.moves += num_moves
+        self.total_games += num_games
+        self.total_moves += num_moves
+
+    def note(self, **values):
+        '''
+        Add values to this generation's record
+        '''
+        self.notes.update(values)
+
+    def end_generation(self, generation, **extra):
+        '''
+        Write the record of a finished generation
+        '''
+        wall = time.perf_counter() - self.wall_start
+        rate_time = self.stages.get('rate', {'wall': wall})['wall']
+        record = {'generation': generation,
+                  'time': time.time(),
+                  'wall': wall,
+                  'cpu': time.process_time() - self.cpu_start,
+                  'stages': self.stages,
+                  'games': self.games,
+                  'games_per_second': self.games / rate_time if rate_time else 0.,
+                  'average_game_length': self.moves / self.games if self.games else 0.,
+                  'peak_rss_mb': peak_rss_mb(),
+                  'rss_mb': current_rss_mb()}
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            record['top_allocators'] = [{'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                                         'size_kb': stat.size / 1024, 'count': stat.count}
+                                        for stat in snapshot.statistics('lineno')[:self.top_allocators]]
+        record.update(self.notes)
+        record.update(extra)
+
+        if self.file is not None:
+            self.file.write(json.dumps(record) + '\n')
+        self.last_record = record
+        return record
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def peak_rss_mb():
+    '''
+    Peak resident set size of this process, None where the resource module is not available
+    '''
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb():
+    '''
+    Resident set size of this process, None where /proc is not available
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
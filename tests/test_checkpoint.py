@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+import trainer
+from checkpoint import checkpoint_name, latest_checkpoint, list_checkpoints, read_genomes, save_checkpoint, write_genomes
+from network import Network, board_layer_sizes, genome_length
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_genomes_round_trip(tmp_path, mmap):
+    sizes = board_layer_sizes((5, 8), (9,))
+    genomes = np.random.default_rng(0).standard_normal((3, genome_length(sizes))).astype(np.float32)
+    layout = Network(genomes[0], sizes).layout()
+    location = tmp_path / 'model'
+    write_genomes(location, genomes, layout, {'score': 1.5})
+
+    read, read_layout, metadata = read_genomes(location, mmap=mmap)
+    assert isinstance(read, np.memmap) == mmap
+    np.testing.assert_array_equal(read, genomes)
+    assert read_layout == [tuple(shape) for shape in layout]
+    assert metadata == {'score': 1.5}
+    assert Network.load(location, mmap=mmap)(np.zeros((5, 8))) == Network(genomes[0], sizes)(np.zeros((5, 8)))
+
+
+def test_checkpoints_keep_the_latest(tmp_path):
+    genomes = np.zeros((2, genome_length(Network.layer_sizes)), dtype=np.float32)
+    for generation in (10, 20, 30):
+        save_checkpoint(tmp_path, generation, genomes, Network().layout(), keep=2)
+    assert [os.path.basename(location) for location in list_checkpoints(tmp_path)] == \
+        [checkpoint_name(20), checkpoint_name(30)]
+    assert read_genomes(latest_checkpoint(tmp_path))[2]['generation'] == 30
+
+
+def run(num_generations, stop=None, resume=False):
+    '''
+    Population and scores after num_generations, saving a checkpoint after
+    generation stop, or first resuming from the latest checkpoint
+    '''
+    mutator, rng = trainer.seed_run(0)
+    arena, population = trainer.new_population()
+    start = 0
+    if resume:
+        start, population, best = trainer.load_state(latest_checkpoint(trainer.checkpoint_dir), mutator, arena, rng)
+    for generation in range(start, num_generations):
+        population, best = trainer.run_generation(arena, population, mutator, rng=rng)
+        if generation + 1 == stop:
+            trainer.save_state(generation + 1, population, best, mutator, rng)
+    return np.stack([network.genome() for network in population]), [score for network, score in best]
+
+
+@pytest.mark.parametrize('schedule, rating', [('round_robin', 'scoreboard'), ('swiss', 'elo'),
+                                              ('random_opponents', 'glicko'), ('racing', 'scoreboard')])
+def test_resumed_run_matches_straight_run(tmp_path, monkeypatch, schedule, rating):
+    monkeypatch.setattr(trainer, 'pop_size', 20)
+    monkeypatch.setattr(trainer, 'population_size', trainer.num_surviving * (20 // trainer.num_surviving + 10))
+    monkeypatch.setattr(trainer, 'checkpoint_dir', str(tmp_path))
+    monkeypatch.setattr(trainer, 'schedule', schedule)
+    monkeypatch.setattr(trainer, 'rating', rating)
+
+    genomes, scores = run(5)
+    run(2, stop=2)
+    resumed_genomes, resumed_scores = run(5, resume=True)
+    np.testing.assert_array_equal(resumed_genomes, genomes)
+    assert resumed_scores == scores
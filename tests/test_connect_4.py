@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_game import Batch_Connect_4
+from connect_4 import Connect_4, engines, max_moves
+from game_records import replay
+
+boards = [((6, 7), 4), ((4, 5), 3), ((5, 9), 4), ((7, 6), 5), ((10, 12), 4), ((3, 8), 3), ((8, 3), 2)]
+
+
+def random_games(num_games, game_board_size, seed=0):
+    '''
+    Legal moves of random games filling the board, each engine stops them at the first line
+    '''
+    num_rows, num_cols = game_board_size
+    rng = random.Random(seed)
+    games = []
+    for _ in range(num_games):
+        heights = [0] * num_cols
+        moves = []
+        for _ in range(max_moves(game_board_size)):
+            col = rng.choice([col for col in range(num_cols) if heights[col] < num_rows])
+            heights[col] += 1
+            moves.append(col)
+        games.append(moves)
+    return games
+
+
+def play_engines(games, **rules):
+    '''
+    (winner, number of moves) of every game on each engine
+    '''
+    results = {}
+    for engine in engines:
+        results[engine] = []
+        for moves in games:
+            game = Connect_4(replay(moves), headless=True, printing=False, engine=engine, **rules)
+            results[engine].append((game.run_game(), len(game.gamestate.game_moves)))
+    return results
+
+
+@pytest.mark.parametrize('game_board_size, connect', boards)
+def test_engines_agree(game_board_size, connect):
+    results = play_engines(random_games(200, game_board_size, seed=connect), game_board_size=game_board_size,
+                           connect=connect)
+    assert results['numpy'] == results['bitboard']
+    # Random games this long end both ways
+    winners = {winner for winner, num_moves in results['numpy']}
+    assert winners >= {0, 1}
+
+
+@pytest.mark.parametrize('game_board_size, connect', boards)
+def test_batch_agrees(game_board_size, connect):
+    games = random_games(200, game_board_size, seed=connect + 1)
+    results = play_engines(games, game_board_size=game_board_size, connect=connect)
+    moves = np.array(games)
+    batch = Batch_Connect_4(None, np.zeros((len(games), 2), dtype=np.int64), game_board_size, connect)
+    batch.policy = lambda players, boards: moves[np.flatnonzero(batch.active),
+                                                 batch.num_moves[np.flatnonzero(batch.active)]]
+    winners = batch.run_game()
+    assert list(zip(winners.tolist(), batch.num_moves.tolist())) == results['numpy']
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from connect_4 import Connect_4, max_moves
+from game_records import Game_Record_Writer, Game_Records, pack_moves, packs_nibbles, record_dtype, replay, \
+    unpack_moves
+
+
+def random_moves(num_games, game_board_size, rng):
+    '''
+    (num_games, max_moves) legal columns of random games of random lengths, -1 after the last move
+    '''
+    num_rows, num_cols = game_board_size
+    moves = np.full((num_games, max_moves(game_board_size)), -1, dtype=np.int16)
+    num_moves = rng.integers(0, max_moves(game_board_size) + 1, num_games)
+    for game, length in enumerate(num_moves):
+        heights = np.zeros(num_cols, dtype=np.int64)
+        for turn in range(length):
+            col = rng.choice(np.flatnonzero(heights < num_rows))
+            heights[col] += 1
+            moves[game, turn] = col
+    return moves, num_moves
+
+
+@pytest.mark.parametrize('game_board_size', [(6, 7), (3, 16), (5, 15), (2, 17), (4, 40)])
+def test_moves_round_trip(game_board_size):
+    rng = np.random.default_rng(game_board_size[1])
+    moves, num_moves = random_moves(200, game_board_size, rng)
+    # The last column, 15 on a 16 wide board, packs to the same nibble as the padding
+    moves[0, :3] = game_board_size[1] - 1
+    num_moves[0] = max(num_moves[0], 3)
+    nibbles = packs_nibbles(game_board_size)
+    assert nibbles == (game_board_size[1] <= 16)
+
+    packed = pack_moves(moves, nibbles)
+    assert packed.shape[1] == record_dtype(game_board_size)['moves'].shape[0]
+    np.testing.assert_array_equal(unpack_moves(packed, num_moves, game_board_size), moves)
+
+
+@pytest.mark.parametrize('game_board_size, connect', [((6, 7), 4), ((3, 16), 3), ((4, 20), 3)])
+def test_records_replay(tmp_path, game_board_size, connect):
+    rng = np.random.default_rng(0)
+    moves, _ = random_moves(50, game_board_size, rng)
+    winners, lengths = [], []
+    for game in moves:
+        played = Connect_4(replay(game[game >= 0].tolist()), headless=True, printing=False, engine='bitboard',
+                           game_board_size=game_board_size, connect=connect)
+        winner = played.run_game()
+        # Random games may end on a line before their last move
+        game[len(played.gamestate.game_moves):] = -1
+        winners.append(winner)
+        lengths.append(len(played.gamestate.game_moves))
+
+    location = tmp_path / 'records'
+    with Game_Record_Writer(location, buffer_size=16, game_board_size=game_board_size, connect=connect) as writer:
+        writer.start_generation(3)
+        writer.add(np.arange(100).reshape(50, 2), np.array(winners), moves, np.array(lengths))
+    records = Game_Records(location)
+    assert (records.game_board_size, records.connect) == (game_board_size, connect)
+    assert len(records) == 50
+    for idx in range(len(records)):
+        generation, players, winner, game = records[idx]
+        assert (generation, players, winner, len(game)) == (3, (2 * idx, 2 * idx + 1), winners[idx], lengths[idx])
+        replayed = Connect_4(replay(game), headless=True, printing=False, game_board_size=records.game_board_size,
+                             connect=records.connect)
+        assert replayed.run_game() == winner
+
+
+def test_writer_rejects_another_board(tmp_path):
+    location = tmp_path / 'records'
+    Game_Record_Writer(location, game_board_size=(5, 9), connect=4).close()
+    with pytest.raises(ValueError):
+        Game_Record_Writer(location, game_board_size=(6, 7), connect=4)
+    with pytest.raises(ValueError):
+        Game_Record_Writer(location, game_board_size=(5, 9), connect=3)
+
+
+def test_truncate_drops_later_generations(tmp_path):
+    location = tmp_path / 'records'
+    moves = np.full((2, max_moves((6, 7))), -1, dtype=np.int16)
+    with Game_Record_Writer(location) as writer:
+        for generation in range(5):
+            writer.start_generation(generation)
+            writer.add([(0, 1), (1, 0)], np.array([-1, -1]), moves, np.array([0, 0]))
+    with Game_Record_Writer(location) as writer:
+        writer.truncate(3)
+        writer.start_generation(3)
+        writer.add([(0, 1)], np.array([-1]), moves[:1], np.array([0]))
+    generations = [Game_Records(location)[idx][0] for idx in range(len(Game_Records(location)))]
+    assert generations == [0, 0, 1, 1, 2, 2, 3]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from hall_of_fame import Hall_Of_Fame, Hall_Of_Fame_Writer
+from network import Network, board_layer_sizes, genome_length
+
+layer_sizes = board_layer_sizes((4, 5), (3,))
+
+
+def generation_best(generation, top_k):
+    '''
+    (network, score) of top_k networks whose genomes and scores tell their generation and rank
+    '''
+    best = []
+    for rank in range(top_k):
+        genome = np.full(genome_length(layer_sizes), generation + rank / 10, dtype=np.float32)
+        best.append((Network(genome, layer_sizes), generation * 10. - rank))
+    return best
+
+
+def archive(location, generations, top_k=3, every=2):
+    with Hall_Of_Fame_Writer(location, Network(None, layer_sizes).layout(), top_k, every) as writer:
+        for generation in generations:
+            writer.add(generation, generation_best(generation, top_k))
+
+
+def test_records(tmp_path):
+    location = tmp_path / 'fame'
+    archive(location, range(1, 10))
+    fame = Hall_Of_Fame(location)
+    assert list(fame.generations()) == [1, 3, 5, 7, 9]
+    # Every record is its own fixed size slot
+    assert fame.records.dtype.itemsize % 64 == 0
+    np.testing.assert_array_equal(fame.scores(), [[gen * 10, gen * 10 - 1, gen * 10 - 2] for gen in range(1, 10, 2)])
+    np.testing.assert_array_equal(fame.scores(4, 8), fame.scores()[2:4])
+    assert fame.score(5, 2) == 48
+    np.testing.assert_array_equal(fame.network(7, 1).genome(), generation_best(7, 3)[1][0].genome())
+    with pytest.raises(KeyError):
+        fame.network(4)
+    population = fame.population(3, 6, ranks=[0])
+    assert len(population) == 2
+    np.testing.assert_array_equal(population.weights[0][1], generation_best(5, 1)[0][0].layers[0].weights)
+
+
+def test_expects_top_k(tmp_path):
+    location = tmp_path / 'fame'
+    with Hall_Of_Fame_Writer(location, Network(None, layer_sizes).layout(), 3) as writer:
+        with pytest.raises(ValueError):
+            writer.add(0, generation_best(0, 2))
+        with pytest.raises(ValueError):
+            writer.add(0, generation_best(0, 4))
+
+
+def test_resume_truncates(tmp_path):
+    '''
+    Archiving an earlier generation again, as a run resumed from a checkpoint
+    does, replaces it and drops every later one
+    '''
+    location = tmp_path / 'fame'
+    archive(location, range(1, 10))
+    archive(location, range(5, 8))
+    fame = Hall_Of_Fame(location)
+    assert list(fame.generations()) == [1, 3, 5, 7]
+    assert fame.score(7) == 70
+    with pytest.raises(ValueError):
+        archive(location, [11])
+    with pytest.raises(ValueError):
+        archive(location, range(1, 4), top_k=2)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from network import Network, Population, board_layer_sizes, genome_length
+
+layer_sizes = [board_layer_sizes((6, 7)), board_layer_sizes((4, 5), (3,)), board_layer_sizes((10, 12), (17, 9, 5))]
+
+
+def random_networks(rng, num_networks, sizes):
+    genomes = rng.standard_normal((num_networks, genome_length(sizes))).astype(np.float32)
+    return [Network(genome, sizes) for genome in genomes]
+
+
+@pytest.mark.parametrize('sizes', layer_sizes)
+@pytest.mark.parametrize('counts', ['even', 'uneven', 'single'])
+def test_population_forward_matches_networks(sizes, counts):
+    '''
+    Even counts go through the padded path of Population.forward, a few
+    networks with most of the boards through the unpadded one
+    '''
+    rng = np.random.default_rng(len(sizes))
+    networks = random_networks(rng, 12, sizes)
+    num_boards = 240
+    if counts == 'even':
+        indexes = rng.permutation(np.arange(num_boards) % len(networks))
+    elif counts == 'uneven':
+        indexes = np.where(rng.random(num_boards) < .9, 0, rng.integers(0, len(networks), num_boards))
+    else:
+        indexes = np.array([3])
+    boards = rng.integers(-1, 2, (len(indexes), sizes[0][0])).astype(float)
+
+    population = Population(networks)
+    expected = np.array([networks[index].forward(board) for index, board in zip(indexes, boards)])
+    np.testing.assert_array_equal(population.forward(indexes, boards), expected)
+    moves = [networks[index](board) for index, board in zip(indexes, boards)]
+    assert population(indexes, boards).tolist() == moves
+
+
+def test_population_from_genomes_views_weights():
+    '''
+    Changing the genomes changes the population's moves, nothing was copied
+    '''
+    rng = np.random.default_rng(0)
+    sizes = board_layer_sizes((6, 7))
+    genomes = rng.standard_normal((5, genome_length(sizes))).astype(np.float32)
+    population = Population.from_genomes(genomes, sizes)
+    boards = rng.integers(-1, 2, (5, 42)).astype(float)
+    genomes *= -1
+    assert len(population) == 5
+    assert population(np.arange(5), boards).tolist() == [Network(genome, sizes)(board)
+                                                         for genome, board in zip(genomes, boards)]
@@ -0,0 +1,109 @@
+import random
+
+import numpy as np
+import pytest
+
+from connect_4 import Connect_4, max_moves
+from game_records import replay
+from search import Negamax_Player, win_score
+
+
+def minimax(player, position, mask, num_moves, depth):
+    '''
+    Value Negamax_Player._negamax must find, searched without pruning or a table
+    '''
+    if num_moves >= player.max_moves:
+        return 0
+    moves = []
+    for idx in range(player.num_cols):
+        if not mask & player.tops[idx]:
+            move = (mask + player.bottoms[idx]) & player.column_masks[idx]
+            if player._won(position | move):
+                return win_score - num_moves
+            moves.append(move)
+    if not moves:
+        return 0
+    if depth == 0:
+        return (bin(position & player.center_mask).count('1')
+                - bin((position ^ mask) & player.center_mask).count('1'))
+    return max(-minimax(player, position ^ mask, mask | move, num_moves + 1, depth - 1) for move in moves)
+
+
+def minimax_move(player, position, mask, num_moves):
+    '''
+    Center-most column of the best value, or the center-most winning one
+    '''
+    best, best_value = None, None
+    for idx, col in enumerate(player.order):
+        if mask & player.tops[idx]:
+            continue
+        move = (mask + player.bottoms[idx]) & player.column_masks[idx]
+        if player._won(position | move):
+            return col
+        value = -minimax(player, position ^ mask, mask | move, num_moves + 1, player.depth)
+        if best_value is None or value > best_value:
+            best, best_value = col, value
+    return best
+
+
+def random_positions(num_positions, game_board_size, connect, seed=0):
+    '''
+    Boards after a random number of random moves, none of them won yet
+    '''
+    rng = random.Random(seed)
+    num_rows, num_cols = game_board_size
+    positions = []
+    while len(positions) < num_positions:
+        heights = [0] * num_cols
+        moves = []
+        for _ in range(rng.randrange(max_moves(game_board_size) - 1)):
+            col = rng.choice([col for col in range(num_cols) if heights[col] < num_rows])
+            heights[col] += 1
+            moves.append(col)
+        game = Connect_4(replay(moves) if moves else [None, None], headless=True, printing=False,
+                         engine='numpy', game_board_size=game_board_size, connect=connect)
+        for move in moves:
+            game.gamestate.current_player = len(game.gamestate.game_moves) % 2
+            game.gamestate.play_turn(move)
+            game.gamestate.game_moves.append(move)
+            if game.gamestate.winner != -1:
+                break
+        if game.gamestate.winner == -1:
+            positions.append(game.gamestate.game_board.copy())
+    return positions
+
+
+@pytest.mark.parametrize('game_board_size, connect, depth', [((6, 7), 4, 1), ((6, 7), 4, 3), ((4, 5), 3, 2),
+                                                            ((4, 5), 3, 4), ((5, 6), 4, 3)])
+def test_negamax_matches_minimax(game_board_size, connect, depth):
+    # One player for every position, so its table carries entries between them
+    player = Negamax_Player(depth, game_board_size, connect)
+    for board in random_positions(40, game_board_size, connect, seed=depth):
+        position, mask, num_moves = player.from_board(board)
+        # Narrow windows first, so their bounds are in the table for the full one
+        for window in ((0, 1), (-1, 0), (-2, 2), (-win_score - 1, win_score + 1)):
+            expected = minimax(player, position, mask, num_moves, depth)
+            value = player._negamax(position, mask, num_moves, depth, *window)
+            if window[0] < expected < window[1]:
+                assert value == expected
+            elif expected <= window[0]:
+                assert value <= window[0]
+            else:
+                assert value >= window[1]
+        assert player(board) == minimax_move(player, position, mask, num_moves)
+
+
+def test_negamax_takes_wins_and_blocks():
+    player = Negamax_Player(2)
+    board = np.full((6, 7), -1.)
+    board[5, 0:3] = 0
+    board[5, 4:6] = 1
+    board[4, 4] = 1
+    # The first player to move, with three in a row
+    assert player(board) == 3
+
+    board = np.full((6, 7), -1.)
+    board[5, [0, 1, 6]] = 0
+    board[3:6, 4] = 1
+    # The first player to move, against three in column 4
+    assert player(board) == 4
@@ -0,0 +1,318 @@
+import math
+from itertools import combinations
+
+import numpy as np
+
+
+# Scheduling strategies
+#
+# Each yields rounds of (N, 2) pairings, the first player of a pair moves first.
+# The ratings array is updated in place after every round, so later rounds can
+# depend on it.
+
+class Round_Robin(object):
+    '''
+    Every unique pair plays once, P * (P - 1) / 2 games
+    '''
+    def __init__(self, rng=None):
+        pass
+
+    def rounds(self, ratings):
+        yield np.array(list(combinations(range(len(ratings)), 2)), dtype=np.int64).reshape(-1, 2)
+
+
+class Random_Opponents(object):
+    '''
+    Every player moves first against k distinct random opponents, P * k games
+    '''
+    def __init__(self, k=10, rng=None):
+        self.k = k
+        self.rng = np.random.default_rng(rng)
+
+    def rounds(self, ratings):
+        num_players = len(ratings)
+        k = min(self.k, num_players - 1)
+        # Sample from the other players by skipping over each player's own index
+        opponents = np.argsort(self.rng.random((num_players, num_players - 1)), axis=1)[:, :k]
+        opponents += opponents >= np.arange(num_players)[:, None]
+        players = np.repeat(np.arange(num_players), k)
+        yield self.rng.permutation(np.stack([players, opponents.reshape(-1)], axis=1))
+
+
+class Group_Round_Robin(object):
+    '''
+    Round robin within random groups of group_size players, about P * (group_size - 1) / 2 games
+    '''
+    def __init__(self, group_size=10, rng=None):
+        self.group_size = group_size
+        self.rng = np.random.default_rng(rng)
+
+    def rounds(self, ratings):
+        order = self.rng.permutation(len(ratings))
+        pairings = []
+        for start in range(0, len(order), self.group_size):
+            group = order[start:start + self.group_size]
+            pairings.extend((group[a], group[b]) for a, b in combinations(range(len(group)), 2))
+        yield self.rng.permutation(np.array(pairings, dtype=np.int64).reshape(-1, 2))
+
+
+class Swiss(object):
+    '''
+    Each round pairs players with neighbours in the current ratings, avoiding
+    rematches, about P / 2 games per round
+    '''
+    def __init__(self, num_rounds=None, rng=None):
+        '''
+            num_rounds: Defaults to ceil(log2(P)) + 2
+        '''
+        self.num_rounds = num_rounds
+        self.rng = np.random.default_rng(rng)
+
+    def rounds(self, ratings):
+        num_players = len(ratings)
+        num_rounds = self.num_rounds or math.ceil(math.log2(max(num_players, 2))) + 2
+        played = set()
+        for _ in range(num_rounds):
+            # Best first, ties broken randomly
+            order = list(np.lexsort((self.rng.random(num_players), -np.asarray(ratings))))
+            pairings = []
+            while len(order) > 1:
+                player = order.pop(0)
+                # The closest rated opponent not played yet, or the closest if all have been
+                opponent = next((other for other in order if (player, other) not in played), order[0])
+                order.remove(opponent)
+                played.update([(player, opponent), (opponent, player)])
+                pairings.append((player, opponent) if self.rng.random() < .5 else (opponent, player))
+            # An odd player out gets a bye
+            yield np.array(pairings, dtype=np.int64).reshape(-1, 2)
+
+
+# Rating models
+#
+# Each keeps a `ratings` array and updates it in place with the winners (-1 for
+# a draw, 0 for the first player and 1 for the second) of a round of pairings.
+
+class Scoreboard(object):
+    '''
+    +1 for a win and -1 for a loss
+    '''
+    def __init__(self, num_players):
+        self.ratings = np.zeros(num_players, dtype=np.int64)
+
+    def update(self, pairings, winners):
+        points = np.select([winners == 0, winners == 1], [1, -1], 0)
+        np.add.at(self.ratings, pairings[:, 0], points)
+        np.add.at(self.ratings, pairings[:, 1], -points)
+
+
+class Elo(object):
+    '''
+    Elo ratings, updated one game at a time in the order they were scheduled
+    '''
+    def __init__(self, num_players, k=32, initial=1500):
+        self.k = k
+        self.ratings = np.full(num_players, float(initial))
+
+    def update(self, pairings, winners):
+        ratings = self.ratings.tolist()
+        for (first, second), score in zip(pairings.tolist(), _first_player_score(winners).tolist()):
+            expected = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+            delta = self.k * (score - expected)
+            ratings[first] += delta
+            ratings[second] -= delta
+        self.ratings[:] = ratings
+
+
+class Glicko(object):
+    '''
+    Glicko ratings with one rating period per round
+    '''
+    q = math.log(10) / 400
+
+    def __init__(self, num_players, initial=1500, deviation=350, volatility=30):
+        '''
+            initial: Starting rating
+            deviation: Starting (and largest) rating deviation
+            volatility: Deviation added back to every player each period
+        '''
+        self.max_deviation = deviation
+        self.volatility = volatility
+        self.ratings = np.full(num_players, float(initial))
+        self.deviations = np.full(num_players, float(deviation))
+
+    def update(self, pairings, winners):
+        deviations = np.minimum(np.sqrt(self.deviations ** 2 + self.volatility ** 2), self.max_deviation)
+        first_score = _first_player_score(winners)
+
+        variance_inv = np.zeros(len(self.ratings))
+        improvement = np.zeros(len(self.ratings))
+        for player, opponent, score in ((pairings[:, 0], pairings[:, 1], first_score),
+                                        (pairings[:, 1], pairings[:, 0], 1 - first_score)):
+            g = 1 / np.sqrt(1 + 3 * (self.q * deviations[opponent]) ** 2 / math.pi ** 2)
+            expected = 1 / (1 + 10 ** (-g * (self.ratings[player] - self.ratings[opponent]) / 400))
+            np.add.at(variance_inv, player, self.q ** 2 * g ** 2 * expected * (1 - expected))
+            np.add.at(improvement, player, g * (score - expected))
+
+        precision = 1 / deviations ** 2 + variance_inv
+        self.ratings += self.q / precision * improvement
+        self.deviations = np.sqrt(1 / precision)
+
+
+def _first_player_score(winners):
+    '''
+    1 for a first player win, 0 for a loss and .5 for a draw
+    '''
+    return np.select([winners == 0, winners == 1], [1., 0.], .5)
+
+
+schedulers = {'round_robin': Round_Robin, 'random_opponents': Random_Opponents,
+              'groups': Group_Round_Robin, 'swiss': Swiss}
+rating_models = {'scoreboard': Scoreboard, 'elo': Elo, 'glicko': Glicko}
+
+
+def run_tournament(play, num_players, scheduler, rating):
+    '''
+    Play every round of a schedule
+        play: Called as play(pairings), returns the winner of each game
+        scheduler: One of the schedulers above
+        rating: A rating model class from above
+    returns the rating model and the number of games played
+    '''
+    ratings = rating(num_players)
+    num_games = 0
+    for pairings in scheduler.rounds(ratings.ratings):
+        if len(pairings):
+            ratings.update(pairings, np.asarray(play(pairings)))
+            num_games += len(pairings)
+    return ratings, num_games
+
+
+# Racing
+#
+# Instead of a fixed schedule, keep playing only the players whose place in
+# or out of the top k is still uncertain, and stop once it is settled.
+
+class Racing(object):
+    '''
+    Each player's mean score (+1 win, -1 loss, 0 draw) against the opponents
+    it has played, with a confidence interval that shrinks as it plays more
+    of them. A player is in the top k once fewer than k others could still
+    be ahead of it, and out once k others are surely ahead of it.
+
+    Pairs are played at most once, lower index first as in Round_Robin, so
+    a player that has played everyone has exactly its round robin score.
+    '''
+
+    def __init__(self, num_players, top_k=5, delta=.05, games_per_round=4, rng=None):
+        '''
+            Constructor for Racing
+            top_k: Number of players to find
+            delta: Chance the top k is allowed to be wrong
+            games_per_round: New opponents each undecided player gets per round
+        '''
+        self.num_players = num_players
+        self.top_k = min(top_k, num_players)
+        self.delta = delta
+        self.games_per_round = games_per_round
+        self.rng = np.random.default_rng(rng)
+        self.points = np.zeros(num_players)
+        self.games = np.zeros(num_players, dtype=np.int64)
+        self.played = np.eye(num_players, dtype=bool)
+        # 1 once in the top k, -1 once out of it, 0 while undecided
+        self.decided = np.zeros(num_players, dtype=np.int64)
+
+    @property
+    def ratings(self):
+        '''
+        Mean scores, which do not always rank the players found to be in the top k first
+        '''
+        return self.points / np.maximum(self.games, 1)
+
+    @property
+    def ranking(self):
+        '''
+        Sort key putting the players found to be in the top k above the rest,
+        each group ordered by mean score. Only for ranking, means span [-1, 1]
+        '''
+        return self.ratings + 4 * (self.decided == 1)
+
+    def bounds(self):
+        '''
+        Lower and upper confidence bounds of every mean score
+        '''
+        num_opponents = self.num_players - 1
+        games = np.maximum(self.games, 1)
+        means = self.points / games
+        # Hoeffding-Serfling bound for sampling opponents without replacement,
+        # scores span 2, split between every player
+        log_term = math.log(2 * self.num_players / self.delta)
+        radius = 2 * np.sqrt((1 - (games - 1) / num_opponents) * log_term / (2 * games))
+        radius[self.games == 0] = np.inf
+        radius[self.games == num_opponents] = 0
+        return means - radius, means + radius
+
+    def decide(self):
+        lower, upper = self.bounds()
+        undecided = self.decided == 0
+        # Others whose upper bound is above this player's lower bound, and
+        # others whose lower bound is above this player's upper bound
+        sorted_upper, sorted_lower = np.sort(upper), np.sort(lower)
+        could_beat = len(upper) - np.searchsorted(sorted_upper, lower, side='right') - (upper > lower)
+        surely_beat = len(lower) - np.searchsorted(sorted_lower, upper, side='right')
+        self.decided[undecided & (could_beat < self.top_k)] = 1
+        self.decided[undecided & (surely_beat >= self.top_k)] = -1
+        if (self.decided == 1).sum() >= self.top_k:
+            self.decided[self.decided == 0] = -1
+
+    def rounds(self):
+        '''
+        Pairings of each round until the top k is settled or every pair has played
+        '''
+        while True:
+            self.decide()
+            pairings = []
+            for player in np.flatnonzero(self.decided == 0):
+                opponents = np.flatnonzero(~self.played[player])
+                if len(opponents) > self.games_per_round:
+                    opponents = self.rng.choice(opponents, self.games_per_round, replace=False)
+                pairings.extend((min(player, opponent), max(player, opponent)) for opponent in opponents)
+            if not pairings:
+                return
+            yield np.unique(np.array(pairings, dtype=np.int64), axis=0)
+
+    def update(self, pairings, winners):
+        points = np.select([winners == 0, winners == 1], [1, -1], 0)
+        np.add.at(self.points, pairings[:, 0], points)
+        np.add.at(self.points, pairings[:, 1], -points)
+        np.add.at(self.games, pairings.reshape(-1), 1)
+        self.played[pairings[:, 0], pairings[:, 1]] = self.played[pairings[:, 1], pairings[:, 0]] = True
+
+
+def run_racing(play, num_players, top_k=5, delta=.05, games_per_round=4, rng=None):
+    '''
+    Play rounds until the top k is settled
+        play: Called as play(pairings), returns the winner of each game
+    returns the Racing model and the number of games played
+    '''
+    racing = Racing(num_players, top_k, delta, games_per_round, rng)
+    num_games = 0
+    for pairings in racing.rounds():
+        racing.update(pairings, np.asarray(play(pairings)))
+        num_games += len(pairings)
+    return racing, num_games
+
+
+def round_robin_games(num_players):
+    return num_players * (num_players - 1) // 2
+
+
+def rank_accuracy(ratings, reference, k):
+    '''
+    How well ratings rank the players compared to reference ratings
+    returns the Spearman rank correlation and the fraction of the reference's top k found in the top k
+    '''
+    ranks = np.argsort(np.argsort(ratings))
+    reference_ranks = np.argsort(np.argsort(reference))
+    spearman = np.corrcoef(ranks, reference_ranks)[0, 1]
+    top_k = set(np.argsort(ratings)[-k:]) & set(np.argsort(reference)[-k:])
+    return spearman, len(top_k) / k
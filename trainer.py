@@ -1,86 +1,386 @@
-from network import Network
-from connect_4 import Connect_4
-from random import uniform, random
+from network import Genome_Arena, board_layer_sizes
+from connect_4 import Connect_4, max_moves
+from batch_game import Batch_Connect_4, score_games
+from mutation import Mutator, default_mutator
+from parallel import Process_Evaluator
+from distributed import Socket_Evaluator
+from tournament import schedulers, rating_models, run_tournament, run_racing, round_robin_games, \
+    rank_accuracy, Round_Robin, Scoreboard
+from checkpoint import save_checkpoint, latest_checkpoint, read_genomes
+from telemetry import Telemetry
+from metrics_server import Metrics_Server
+from match_cache import Match_Cache
+from position_cache import Position_Cache
+from game_records import Game_Record_Writer
+from hall_of_fame import Hall_Of_Fame_Writer
+from quantize import inference_network, inference_population
+from search import Negamax_Player, ladder_policy
+from random import uniform, random, getstate, setstate, seed as seed_random
+from contextlib import ExitStack
 
 import os
-from itertools import combinations
 import numpy as np
-import copy 
 import tqdm
-import multiprocessing.dummy as multiprocessing
 
 total_generations = 1000
+# Seeds every random choice of a run: mutations, new networks, schedules and
+# racing, so a run can be repeated (None for a different run every time)
+seed = 0
+# Rows and columns of the board and stones in a line needed to win. Networks
+# take every cell as an input and score every column, with hidden_sizes between
+game_board_size = (6, 7)
+connect = 4
+hidden_sizes = (32, 22)
 pop_size = 100
 mutation_rate = 1e-5
 num_surviving = 5
+# Each survivor is copied pop_size // num_surviving times alongside 10 new networks
+population_size = num_surviving * (pop_size // num_surviving + 10)
+engine = 'bitboard'
+# 'serial' plays one Connect_4 at a time, 'batched' plays every pairing in lockstep,
+# 'processes' splits the pairings between worker processes, 'distributed' hands
+# them out to workers connected over TCP (started with `python distributed.py host port`)
+simulator = 'batched'
+num_workers = os.cpu_count()
+chunk_size = None
+# Only reachable from this machine, the protocol has no authentication. Listen on
+# '0.0.0.0' for workers on other machines of a trusted network
+coordinator_address = ('127.0.0.1', 5555)
+# Who plays who, one of tournament.schedulers, and how the results are rated,
+# one of tournament.rating_models. 'racing' instead only plays the networks
+# whose place in the top num_surviving is uncertain, and stops once it is
+# settled; every racing_audit_every generations (0 to never) it is checked
+# against a full round robin
+schedule = 'round_robin'
+rating = 'scoreboard'
+racing_audit_every = 0
+# Save the population every checkpoint_every generations (0 to never) and
+# resume from the latest checkpoint in checkpoint_dir
+checkpoint_dir = 'checkpoints'
+checkpoint_every = 10
+# Append stage timings, game counts and memory use of every generation to
+# telemetry_path (None to turn off), tracing allocations every tracemalloc_every generations.
+# Kept out of log/, which only holds models
+telemetry_path = 'telemetry/telemetry.jsonl'
+tracemalloc_every = 100
+# Serve live metrics of the run from a background thread, as Prometheus text on
+# http://host:port/metrics and as json on /metrics.json (None to turn off),
+# for example ('127.0.0.1', 9100)
+metrics_address = None
+# Reuse the results of games between networks with identical weights, keeping
+# up to match_cache_size results (0 to turn off)
+match_cache_size = 200000
+# Remember the move each network plays on each board it has seen, up to
+# position_cache_size boards per network (0 to turn off), for example 10000.
+# Only applies to simulator = 'serial', the others never ask a network about
+# one board at a time
+position_cache_size = 0
+# Precision the serial and batched simulators play with, one of quantize.modes.
+# 'float64' is the reference, 'float32' and 'int8' rarely pick another move. Batched,
+# both play about 1.5 to 1.8 times as many boards per second as float64; one board at
+# a time (the serial simulator) float32 is about 1.3 times as fast and int8 no faster,
+# it only saves memory. See benchmarks/quantization.py
+# The processes and distributed simulators only play with 'float64'
+inference = 'float64'
+# How networks are scored: 'tournament' plays them against each other, 'ladder'
+# plays each one with both colors against a search.Negamax_Player of each of
+# ladder_depths, which is O(pop_size) games and comparable between runs
+fitness = 'tournament'
+ladder_depths = (0, 1, 2, 3)
+# Kept between generations so their transposition tables are reused
+_ladder_opponents = {}
+# Append the moves of every game the serial and batched simulators play to
+# this game_records file (None to turn off)
+game_record_path = None
+# Append the num_surviving best networks of every hall_of_fame_every-th
+# generation to this hall_of_fame archive (None to turn off). Each archived
+# generation takes the same num_surviving fixed size records, 44 KB with the
+# default network, so 100k generations take 4.2 GB
+hall_of_fame_path = None
+hall_of_fame_every = 1
 
-def find_winner(population, scoreboard):
+def find_winner(population):
     def run(players):
         p1, p2 = players
-        game = Connect_4([population[p1], population[p2]], headless=True, printing=False)
-        winner = game.run_game()
-        if winner == 0:
-            scoreboard[p1] += 1
-            scoreboard[p2] -= 1
-        if winner == 1:
-            scoreboard[p1] -= 1
-            scoreboard[p2] += 1
+        game = Connect_4([population[p1], population[p2]], headless=True, printing=False, engine=engine,
+                         game_board_size=game_board_size, connect=connect)
+        return game.run_game(), game.gamestate.game_moves
     return run
 
-def rate(population):
+def play(population, pairings, evaluator=None, records=None, positions=None):
+    '''
+    Find the winner and number of moves of every pairing
+        records: Game_Record_Writer to store the games in
+        positions: Position_Cache the serial simulator's networks remember their moves in
+    '''
+    if evaluator is not None:
+        return evaluator.play(population, pairings)
+    if simulator == 'batched':
+        games = Batch_Connect_4(inference_population(population, inference), pairings, game_board_size, connect)
+        winners = games.run_game()
+        if records is not None:
+            records.add(pairings, winners, games.moves, games.num_moves)
+        return winners, games.num_moves
+    players = [inference_network(network, inference) for network in population]
+    if positions is not None:
+        players = [positions.memo(network, player) for network, player in zip(population, players)]
+    results = list(map(find_winner(players), pairings))
+    winners = np.array([winner for winner, game_moves in results], dtype=np.int64)
+    num_moves = np.array([len(game_moves) for winner, game_moves in results], dtype=np.int64)
+    if records is not None:
+        moves = np.full((len(results), max_moves(game_board_size)), -1, dtype=np.int16)
+        for idx, (winner, game_moves) in enumerate(results):
+            moves[idx, :len(game_moves)] = game_moves
+        records.add(pairings, winners, moves, num_moves)
+    return winners, num_moves
+
+def ladder_scores(population, telemetry=None):
+    '''
+    Points of each network against the search ladder: +1 for a win, -1 for a
+    loss, where an invalid play loses instead of ending the game in a draw
+    '''
+    opponents = [_ladder_opponents.setdefault(depth, Negamax_Player(depth, game_board_size, connect))
+                 for depth in ladder_depths]
+    num_networks = len(population)
+    pairings = [(network, num_networks + rung) for network in range(num_networks) for rung in range(len(opponents))]
+    pairings += [(opponent, network) for network, opponent in pairings]
+    policy = ladder_policy(inference_population(population, inference), num_networks, opponents)
+    games = Batch_Connect_4(policy, pairings, game_board_size, connect)
+    winners = games.run_game()
+    # A game that stopped early without a winner ended on an invalid play by the player to move
+    forfeits = (winners == -1) & (games.num_moves < games.max_moves)
+    winners[forfeits] = 1 - games.turn[forfeits]
+    if telemetry is not None:
+        telemetry.count_games(len(winners), int(games.num_moves.sum()))
+    return score_games(pairings, winners, num_networks + len(opponents))[:num_networks]
+
+def rate(population, evaluator=None, telemetry=None, cache=None, records=None, positions=None, rng=None):
     '''
     Find the scores of all the models
+        rng: numpy Generator the schedules and racing draw from
+    returns the scores and, when they alone do not rank the models, the key to rank them by
     '''
-    scoreboard = [0] * len(population)
+    if fitness == 'ladder':
+        return ladder_scores(population, telemetry).tolist(), None
+
+    def simulate(pairings):
+        winners, num_moves = play(population, pairings, evaluator, records, positions)
+        if telemetry is not None:
+            telemetry.count_games(len(winners), int(num_moves.sum()))
+        return winners, num_moves
 
-    # All unique pairs of ai's
-    indexes = combinations(range(len(population)), 2)
-    list(map(find_winner(population, scoreboard), indexes))
+    def play_round(pairings):
+        if cache is not None:
+            return cache.play(population, pairings, simulate)[0]
+        return simulate(pairings)[0]
 
-    return scoreboard
+    if schedule == 'racing':
+        ratings, num_games = run_racing(play_round, len(population), num_surviving, rng=rng)
+        if telemetry is not None:
+            telemetry.note(games_saved=round_robin_games(len(population)) - num_games)
+            if racing_audit_every and telemetry.generation % racing_audit_every == 0:
+                reference, _ = run_tournament(play_round, len(population), Round_Robin(), Scoreboard)
+                telemetry.note(top_k_agreement=rank_accuracy(ratings.ranking, reference.ratings, num_surviving)[1])
+        return ratings.ratings.tolist(), ratings.ranking.tolist()
 
-def find_n_best(scores, population, n):
+    ratings, num_games = run_tournament(play_round, len(population), schedulers[schedule](rng=rng),
+                                        rating_models[rating])
+    return ratings.ratings.tolist(), None
+
+def find_n_best(scores, population, n, ranking=None):
     '''
     Get the best n models of the population
+        ranking: Key to pick the best by instead of the scores
     '''
+    ranking = list(scores if ranking is None else ranking)
     best = []
     for i in range(n):
-        best_score_idx = np.argmax(scores)
+        best_score_idx = np.argmax(ranking)
+        ranking.pop(best_score_idx)
         best.append((population.pop(best_score_idx), scores.pop(best_score_idx)))
     return best
 
-# Create a bunch of networks
-population = [Network() for i in range(pop_size)]
-best = []
+def seed_run(run_seed):
+    '''
+    Seed every random choice of a run from run_seed
+    returns the Mutator and the numpy Generator to pass to run_generation
+    '''
+    mutator_seed, default_seed, tournament_seed = np.random.SeedSequence(run_seed).spawn(3)
+    seed_random(run_seed)
+    default_mutator.rng = np.random.default_rng(default_seed)
+    return Mutator(mutation_rate=mutation_rate, seed=mutator_seed), np.random.default_rng(tournament_seed)
+
+def save_state(generation, population, best, mutator, rng=None):
+    '''
+    Checkpoint everything needed to carry on from generation
+        rng: Generator the tournaments draw from
+    '''
+    networks = population + [network for network, score in best]
+    state = getstate()
+    metadata = {'population_size': len(population),
+                'best_scores': [score for network, score in best],
+                'random_state': [state[0], list(state[1]), state[2]],
+                'mutator_state': mutator.rng.bit_generator.state,
+                'default_mutator_state': default_mutator.rng.bit_generator.state,
+                'tournament_state': rng.bit_generator.state if rng is not None else None}
+    save_checkpoint(checkpoint_dir, generation, np.stack([network.genome() for network in networks]),
+                    networks[0].layout(), metadata)
+
+def load_state(location, mutator, arena, rng=None):
+    '''
+    Restore a checkpoint into the arena, returns the generation to carry on
+    from, the population and the best models
+        rng: Generator the tournaments draw from, restored too
+    '''
+    genomes, layout, metadata = read_genomes(location)
+    num_population, num_best = metadata['population_size'], len(metadata['best_scores'])
+    np.copyto(arena.genomes[:num_population], genomes[:num_population])
+    np.copyto(arena.genomes[population_size:population_size + num_best], genomes[num_population:])
+    population = arena.networks[:num_population]
+    best = list(zip(arena.networks[population_size:], metadata['best_scores']))
+
+    version, state, gauss_next = metadata['random_state']
+    setstate((version, tuple(state), gauss_next))
+    mutator.rng.bit_generator.state = metadata['mutator_state']
+    default_mutator.rng.bit_generator.state = metadata['default_mutator_state']
+    if rng is not None and metadata.get('tournament_state') is not None:
+        rng.bit_generator.state = metadata['tournament_state']
+    return metadata['generation'], population, best
+
+def new_population():
+    '''
+    Every network lives in one preallocated arena, with room to set the survivors aside
+    returns the arena and the first population
+    '''
+    arena = Genome_Arena(population_size + num_surviving, board_layer_sizes(game_board_size, hidden_sizes))
+    population = arena.networks[:pop_size]
+    for network in population:
+        arena.randomize(network)
+    return arena, population
+
+def run_generation(arena, population, mutator, evaluator=None, telemetry=None, cache=None, records=None,
+                   positions=None, rng=None):
+    '''
+    Mutate, rate and repopulate, returns the next population and the best models
+        rng: numpy Generator the schedules and racing draw from
+    '''
+    telemetry = telemetry or Telemetry()
 
-# Iterate over all generations
-for generation in tqdm.tqdm(range(total_generations)):
-    
     # Mutate some of the models
-    for net in population:
-        if random() > .5:
-            net.mutate(mutation_rate=mutation_rate)
+    with telemetry.stage('mutate'):
+        mutator.mutate_population([net for net in population if random() > .5])
 
     # Score best models
-    scores = rate(population)
-    best = find_n_best(scores, population, num_surviving)
-
-    # Create new population
-    population = []
-    total_score = sum([survivor[1] for survivor in best])
-    for network, score in best:
-        # Weigh the numbers of copies
-        num_copies = pop_size // num_surviving
-        copies = [copy.deepcopy(network) for _ in range(num_copies)]
-        population.extend(copies)
-        population.extend([Network() for _ in range(10)])
-
-# Save the best models
-if not os.path.exists("log"):
-    os.mkdir("log")
-for idx, (best_net, score) in enumerate(best):
-    best_net.save(f'log/{idx}_score_{score}')
-
-# Play a game against it
-game = Connect_4([None, best[0][0]], headless=True, printing=True)
-winner = game.run_game()
+    with telemetry.stage('rate'):
+        scores, ranking = rate(population, evaluator, telemetry, cache, records, positions, rng)
+    telemetry.note(median_score=float(np.median(scores)))
+    with telemetry.stage('find_n_best'):
+        best = find_n_best(scores, population, num_surviving, ranking)
+
+    with telemetry.stage('repopulate'):
+        # Set the survivors aside so refilling the population can't overwrite them
+        survivors = arena.networks[population_size:]
+        for survivor, (network, score) in zip(survivors, best):
+            arena.copy(network, survivor)
+        best = [(survivor, score) for survivor, (network, score) in zip(survivors, best)]
+
+        # Create new population in place
+        population = arena.networks[:population_size]
+        total_score = sum([survivor[1] for survivor in best])
+        row = 0
+        for network, score in best:
+            # Weigh the numbers of copies
+            num_copies = pop_size // num_surviving
+            for target in population[row:row + num_copies]:
+                arena.copy(network, target)
+            for target in population[row + num_copies:row + num_copies + 10]:
+                arena.randomize(target)
+            row += num_copies + 10
+    return population, best
+
+def main():
+    if inference != 'float64' and simulator in ('processes', 'distributed'):
+        # Their workers always play with the trained float64 weights
+        raise ValueError(f"inference = '{inference}' is only used by the serial and batched simulators, "
+                         f"set it to 'float64' with simulator = '{simulator}'")
+    with ExitStack() as resources:
+        # Released on errors and Ctrl-C too: the metrics server, the worker
+        # pool and its shared memory, the coordinator's sockets and open files
+        evaluator = None
+        if simulator == 'processes':
+            evaluator = Process_Evaluator(num_workers, chunk_size, game_board_size, connect)
+        elif simulator == 'distributed':
+            evaluator = Socket_Evaluator(*coordinator_address, game_board_size=game_board_size, connect=connect)
+        if evaluator is not None:
+            resources.callback(evaluator.close)
+
+        # Create a bunch of networks
+        mutator, rng = seed_run(seed)
+        arena, population = new_population()
+        best = []
+        start_generation = 0
+        checkpoint = latest_checkpoint(checkpoint_dir) if checkpoint_every else None
+        if checkpoint is not None:
+            start_generation, population, best = load_state(checkpoint, mutator, arena, rng)
+
+        telemetry = Telemetry(telemetry_path, tracemalloc_every)
+        resources.callback(telemetry.close)
+        metrics = Metrics_Server(telemetry, evaluator, *metrics_address) if metrics_address else None
+        if metrics is not None:
+            resources.callback(metrics.close)
+        cache = Match_Cache(match_cache_size) if match_cache_size else None
+        positions = Position_Cache(position_cache_size) if position_cache_size and simulator == 'serial' else None
+        records = Game_Record_Writer(game_record_path, game_board_size=game_board_size,
+                                     connect=connect) if game_record_path else None
+        if records is not None:
+            resources.callback(records.close)
+            # The generations after the checkpoint are played again
+            records.truncate(start_generation)
+        fame = Hall_Of_Fame_Writer(hall_of_fame_path, arena.networks[0].layout(), num_surviving,
+                                   hall_of_fame_every) if hall_of_fame_path else None
+        if fame is not None:
+            resources.callback(fame.close)
+
+        # Iterate over all generations
+        progress = tqdm.tqdm(range(start_generation, total_generations), initial=start_generation,
+                             total=total_generations)
+        for generation in progress:
+            telemetry.start_generation(generation)
+            if records is not None:
+                records.start_generation(generation)
+            population, best = run_generation(arena, population, mutator, evaluator, telemetry, cache, records,
+                                              positions, rng)
+
+            if fame is not None:
+                with telemetry.stage('hall_of_fame'):
+                    fame.add(generation, best)
+            if checkpoint_every and (generation + 1) % checkpoint_every == 0:
+                with telemetry.stage('checkpoint'):
+                    save_state(generation + 1, population, best, mutator, rng)
+            cache_counts = cache.take_counts() if cache is not None else {}
+            if positions is not None:
+                cache_counts.update(positions.take_counts())
+            record = telemetry.end_generation(generation, best_score=best[0][1], **cache_counts)
+            progress.set_postfix(games_per_second=f'{record["games_per_second"]:,.0f}')
+
+        if cache is not None:
+            print(cache.report())
+        if positions is not None:
+            print(positions.report())
+        if simulator == 'distributed':
+            print(evaluator.report())
+
+    # Save the best models
+    if not os.path.exists("log"):
+        os.mkdir("log")
+    for idx, (best_net, score) in enumerate(best):
+        best_net.save(f'log/{idx}_score_{score}', score=score, generation=total_generations,
+                      game_board_size=list(game_board_size), connect=connect)
+
+    # Play a game against it
+    game = Connect_4([None, best[0][0]], headless=True, printing=True, game_board_size=game_board_size,
+                     connect=connect)
+    winner = game.run_game()
+
+if __name__ == '__main__':
+    main()